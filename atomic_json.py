@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Any
+
+# Serialises read-modify-write of shared files (e.g. bypass_stats.json) between writers in this process
+_lock = threading.Lock()
+
+def write_json(path: str, data: Any, fsync: bool = False, **dump_kwargs):
+    """Write data as JSON so readers only ever see the old or the new file; raises on failure"""
+    directory = os.path.dirname(os.path.abspath(path))
+    # A unique temp file per write, so concurrent writers never rename each other's file
+    fd, tmp_file = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **dump_kwargs)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        raise
+
+def update_json_key(path: str, key: str, value: Any, **dump_kwargs):
+    """Set one top-level key of a JSON object file, leaving the other keys as they are"""
+    with _lock:
+        data = {}
+        try:
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    data = json.load(f)
+        except Exception as e:
+            print(f"Error reading {path}: {e}")
+        data[key] = value
+        try:
+            write_json(path, data, **dump_kwargs)
+        except Exception as e:
+            print(f"Error writing {path}: {e}")
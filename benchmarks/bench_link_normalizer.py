@@ -0,0 +1,48 @@
+"""Canonicalisation throughput over the real-world link corpus.
+
+The corpus (tests/link_variants.json) is checked by tests/test_link_normalizer.py;
+this script only times it. Run from the repository root:
+
+    python benchmarks/bench_link_normalizer.py [iterations]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import link_normalizer
+from link_normalizer import cache_key, check_link
+
+
+def load_corpus():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'link_variants.json')
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def bench(corpus, iterations: int):
+    links = [link for group in corpus['groups'] for link in group['variants']]
+    raw_keys = set(links)
+    print(f"variants: {len(links)}, distinct raw strings: {len(raw_keys)}, "
+          f"distinct cache keys: {len({cache_key(link) for link in links})}")
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for link in links:
+            check_link.__wrapped__(link)
+    elapsed = time.perf_counter() - started
+    print(f"{'canonicalise, cold':<28}{iterations * len(links) / elapsed:12,.0f} links/s")
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for link in links:
+            cache_key(link)
+    elapsed = time.perf_counter() - started
+    print(f"{'cache_key, memoised':<28}{iterations * len(links) / elapsed:12,.0f} links/s")
+    print(f"memo: {link_normalizer.get_stats()}")
+
+
+if __name__ == '__main__':
+    bench(load_corpus(), int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,83 @@
+"""Decode + parse throughput for provider replies, and cached result size.
+
+Payloads in sample_payloads.json follow each provider's reply format
+(one success and one failure each). Run from the repository root:
+
+    python benchmarks/bench_parse_response.py [iterations]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bypass_provider
+from bypass_provider import BypassProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+API_NAMES = {
+    'bypass-vip': 'Bypass VIP',
+    'ace-bypass': 'Ace Bypass',
+    'trw-bypass': 'TRW Bypass',
+    'zen-bypass': 'ZEN Bypass',
+    'eas-bypass': 'EAS-X Bypass'
+}
+
+
+def load_samples():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_payloads.json')
+    with open(path, 'r') as f:
+        samples = json.load(f)
+    return [
+        (provider, json.dumps(payload).encode())
+        for provider, payloads in samples.items()
+        for payload in payloads
+    ]
+
+
+def bench(label, provider_obj, loads, samples, iterations, use_schema=True):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for provider, body in samples:
+            provider_obj._parse_response(loads(body), API_NAMES[provider], provider if use_schema else None)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36}{iterations * len(samples) / elapsed:12,.0f} replies/s")
+
+
+def cached_size(provider_obj, samples):
+    total = 0
+    for provider, body in samples:
+        result = provider_obj._parse_response(json.loads(body), API_NAMES[provider], provider)
+        if result['success']:
+            total += len(json.dumps(result))
+    return total
+
+
+def run(iterations: int):
+    samples = load_samples()
+    tmp = tempfile.mkdtemp()
+    files = {'stats_file': os.path.join(tmp, 'stats.json'), 'routing_file': os.path.join(tmp, 'routes.json')}
+    provider_obj = BypassProvider(**files)
+    lean_obj = BypassProvider(keep_raw_data=False, **files)
+
+    bench('json, default schema order', provider_obj, json.loads, samples, iterations, use_schema=False)
+    bench('json, schema table', provider_obj, json.loads, samples, iterations)
+    if orjson:
+        bench('orjson, schema table', provider_obj, orjson.loads, samples, iterations)
+        bench('orjson, schema table, no raw_data', lean_obj, orjson.loads, samples, iterations)
+    else:
+        print('orjson not installed; skipping fast-decoder runs')
+    print(f"decoder in use: {'orjson' if bypass_provider.orjson else 'json'}")
+
+    print(f"cached bytes with raw_data:    {cached_size(provider_obj, samples):8,}")
+    print(f"cached bytes without raw_data: {cached_size(lean_obj, samples):8,}")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
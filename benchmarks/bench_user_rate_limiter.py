@@ -0,0 +1,53 @@
+"""Throughput and memory of UserRateLimiter's check/record path.
+
+Run from the repository root:  python benchmarks/bench_user_rate_limiter.py [users]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from user_rate_limiter import UserRateLimiter
+
+
+def run(users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Limits are raised so every record and check runs the full allowed path
+        limiter = UserRateLimiter(rate_file=os.path.join(tmp, 'user_rates.json'),
+                                  short_term_limit=10, daily_limit=1000)
+
+        started = time.perf_counter()
+        for user_id in range(users):
+            limiter.record_bypass(user_id)
+        record_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(3):
+            for user_id in range(users):
+                limiter.check_rate_limit(user_id)
+        check_elapsed = time.perf_counter() - started
+        limiter.close()
+
+    # Memory is measured in a separate pass so tracemalloc doesn't skew timings
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        limiter = UserRateLimiter(rate_file=os.path.join(tmp, 'user_rates.json'),
+                                  short_term_limit=10, daily_limit=1000)
+        baseline = tracemalloc.get_traced_memory()[0]
+        for user_id in range(users):
+            limiter.record_bypass(user_id)
+        state_bytes = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        limiter.close()
+
+    print(f"users:            {users}")
+    print(f"record_bypass:    {users / record_elapsed:12,.0f} ops/s")
+    print(f"check_rate_limit: {users * 3 / check_elapsed:12,.0f} ops/s")
+    print(f"state memory:     {state_bytes / users:12,.0f} bytes/user")
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,134 @@
+"""Local aiohttp server that emulates the five bypass provider APIs.
+
+Each provider is mounted under /<provider-key>/ with its real path and reply
+format, so BypassProvider(base_urls=server.base_urls()) talks to it unchanged.
+Latency, errors, "not supported" replies and 429s are drawn from an RNG
+seeded by (seed, provider, link, nth request for that link), so each request
+gets the same outcome whatever order concurrent requests arrive in.
+"""
+import asyncio
+import hashlib
+import random
+from typing import Dict, Optional
+
+from aiohttp import web
+
+PATHS = {
+    'bypass-vip': ('GET', '/premium/bypass'),
+    'ace-bypass': ('GET', '/api/bypass'),
+    'trw-bypass': ('GET', '/api/bypass'),
+    'zen-bypass': ('GET', '/v1/bypass'),
+    'eas-bypass': ('POST', '/v3/bypass')
+}
+
+DEFAULT_PROFILE = {
+    # Latency is lognormal around median seconds; sigma controls the tail
+    'median': 0.05,
+    'sigma': 0.5,
+    'error_rate': 0.02,
+    'unsupported_rate': 0.05,
+    'rate_limited_rate': 0.0,
+    'retry_after': 1
+}
+
+
+class FakeProviderServer:
+    def __init__(self, profiles: Optional[Dict[str, Dict]] = None, seed: int = 1, host: str = '127.0.0.1', port: int = 0):
+        profiles = profiles or {}
+        self.profiles = {provider: {**DEFAULT_PROFILE, **profiles.get(provider, {})} for provider in PATHS}
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self.runner = None
+        self.requests = {provider: 0 for provider in PATHS}
+        # (provider, link) -> requests seen, so retries of one link draw different outcomes
+        self.link_requests = {}
+
+    def base_urls(self) -> Dict[str, str]:
+        return {provider: f'http://{self.host}:{self.port}/{provider}' for provider in PATHS}
+
+    async def start(self):
+        app = web.Application()
+        for provider, (method, path) in PATHS.items():
+            app.router.add_route(method, f'/{provider}{path}', self._handler(provider))
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        if self.port == 0:
+            self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def _handler(self, provider: str):
+        profile = self.profiles[provider]
+
+        async def handle(request: web.Request) -> web.Response:
+            self.requests[provider] += 1
+            if request.method == 'POST':
+                link = (await request.json()).get('url', '')
+            else:
+                link = request.query.get('url', '')
+
+            rng = self._rng(provider, link)
+            roll = rng.random()
+            delay = rng.lognormvariate(0, profile['sigma']) * profile['median']
+            await asyncio.sleep(delay)
+
+            if roll < profile['rate_limited_rate']:
+                return web.Response(status=429, text='Too Many Requests',
+                                    headers={'Retry-After': str(profile['retry_after'])})
+            roll -= profile['rate_limited_rate']
+            if roll < profile['error_rate']:
+                return web.Response(status=502, text='Bad Gateway')
+            roll -= profile['error_rate']
+            if roll < profile['unsupported_rate']:
+                return web.json_response(self._unsupported(provider))
+            return web.json_response(self._success(provider, link))
+
+        return handle
+
+    def _rng(self, provider: str, link: str) -> random.Random:
+        count = self.link_requests.get((provider, link), 0)
+        self.link_requests[(provider, link)] = count + 1
+        digest = hashlib.blake2b(f'{self.seed}|{provider}|{link}|{count}'.encode(), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, 'big'))
+
+    def _success(self, provider: str, link: str) -> Dict:
+        destination = f'https://example.com/resolved?from={link}'
+        loadstring = f'loadstring(game:HttpGet("{destination}"))()'
+        if provider == 'ace-bypass':
+            return {'loadstring': loadstring, 'destination': destination, 'time_taken': '0.80s'}
+        if provider == 'trw-bypass':
+            return {'success': True, 'result': destination, 'time': '1.10s'}
+        if provider == 'zen-bypass':
+            return {'status': 'success', 'result': [loadstring, destination], 'elapsed': 1.2}
+        return {'status': 'success', 'result': destination}
+
+    def _unsupported(self, provider: str) -> Dict:
+        if provider in ('ace-bypass', 'trw-bypass'):
+            return {'error': 'Unsupported link'}
+        return {'status': 'error', 'message': 'Link not supported'}
+
+
+async def _serve(port: int):
+    server = FakeProviderServer(port=port)
+    await server.start()
+    for provider, url in server.base_urls().items():
+        print(f'{provider}: {url}')
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    import sys
+    asyncio.run(_serve(int(sys.argv[1]) if len(sys.argv) > 1 else 8099))
@@ -0,0 +1,200 @@
+"""Reproducible load test for the bypass path, cache and rate limiters.
+
+Starts the fake provider server, drives each component at the requested
+concurrency and prints one JSON document (also written with --output) so
+runs can be diffed across commits. Each component runs in its own process,
+so its peak RSS is not inflated by the components before it. Run from the
+repository root:
+
+    python benchmarks/load_test.py --requests 2000 --concurrency 50 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bypass_provider import BypassProvider
+from cache_manager import CacheManager
+from fake_providers import FakeProviderServer
+from rate_limiter import RateLimiter
+from user_rate_limiter import UserRateLimiter
+
+
+def summarize(latencies, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+
+    return {
+        'operations': len(ordered),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(ordered) / elapsed, 1) if elapsed else None,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99)
+    }
+
+
+async def bench_bypass(args, tmp: str) -> dict:
+    profiles = json.loads(args.profile) if args.profile else None
+    async with FakeProviderServer(profiles, seed=args.seed) as server:
+        provider = BypassProvider(
+            'ace', 'trw', 'zen', 'eas', 'vip',
+            strategy=args.strategy,
+            stats_file=os.path.join(tmp, 'provider_stats.json'),
+            routing_file=os.path.join(tmp, 'routing_index.json'),
+            base_urls=server.base_urls()
+        )
+        links = [f'https://linkvertise.com/{args.seed}/{i}' for i in range(args.unique_links)]
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        outcomes = {'success': 0, 'failure': 0}
+
+        async def one(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                result = await provider.bypass(links[i % len(links)], timeout=args.timeout)
+                latencies.append(time.perf_counter() - started)
+                outcomes['success' if result['success'] else 'failure'] += 1
+
+        async with provider:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+
+        result = summarize(latencies, elapsed)
+        result['outcomes'] = outcomes
+        result['upstream_requests'] = dict(server.requests)
+        return result
+
+
+def bench_cache(args) -> dict:
+    cache = CacheManager(max_entries=args.cache_entries)
+    value = {'success': True, 'loadstring': 'x' * 200, 'bypassed_url': 'https://example.com/x', 'api_name': 'ZEN Bypass'}
+    keys = [f'https://example.com/{i}' for i in range(args.cache_entries * 2)]
+    # Skewed (Pareto) access so popular links are hot, as in auto-bypass channels
+    rng = random.Random(args.seed)
+    order = [keys[int(rng.paretovariate(0.5)) % len(keys)] for _ in range(args.operations)]
+    latencies = []
+    started = time.perf_counter()
+    for key in order:
+        op_started = time.perf_counter()
+        if cache.get(key) is None:
+            cache.set(key, value)
+        latencies.append(time.perf_counter() - op_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    result['cache'] = cache.get_stats()
+    return result
+
+
+def bench_rate_limiter(args) -> dict:
+    limiter = RateLimiter(max_requests=10, time_window=60)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.operations):
+        op_started = time.perf_counter()
+        limiter.is_allowed(f'user-{i % args.users}')
+        latencies.append(time.perf_counter() - op_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def bench_user_rate_limiter(args, tmp: str) -> dict:
+    limiter = UserRateLimiter(rate_file=os.path.join(tmp, 'user_rates.json'))
+    latencies = []
+    started = time.perf_counter()
+    for i in range(args.operations):
+        user_id = i % args.users
+        op_started = time.perf_counter()
+        if limiter.check_rate_limit(user_id)['allowed']:
+            limiter.record_bypass(user_id)
+        latencies.append(time.perf_counter() - op_started)
+    result = summarize(latencies, time.perf_counter() - started)
+    limiter.close()
+    return result
+
+
+COMPONENTS = ('bypass', 'cache', 'rate_limiter', 'user_rate_limiter')
+
+
+def run_component(args, name: str, tmp: str) -> dict:
+    if name == 'bypass':
+        result = asyncio.run(bench_bypass(args, tmp))
+    elif name == 'cache':
+        result = bench_cache(args)
+    elif name == 'rate_limiter':
+        result = bench_rate_limiter(args)
+    else:
+        result = bench_user_rate_limiter(args, tmp)
+    # Peak of this process only, which runs nothing but this component (ru_maxrss is in KiB on Linux)
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def run_in_subprocess(args, name: str) -> dict:
+    argv = [sys.executable, os.path.abspath(__file__), '--only', name]
+    for dest, value in vars(args).items():
+        if value is not None and dest not in ('only', 'output'):
+            argv += [f"--{dest.replace('_', '-')}", str(value)]
+    output = subprocess.check_output(argv, text=True)
+    return json.loads(output)['results'][name]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except Exception:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000, help='bypass calls to make')
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent bypass calls')
+    parser.add_argument('--unique-links', type=int, default=200, help='distinct links among the bypass calls')
+    parser.add_argument('--strategy', default='sequential', choices=['sequential', 'hedged', 'race'])
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--profile', help='JSON per-provider overrides, e.g. \'{"zen-bypass": {"median": 0.2}}\'')
+    parser.add_argument('--operations', type=int, default=200000, help='operations for the cache/limiter runs')
+    parser.add_argument('--users', type=int, default=10000, help='distinct keys for the limiter runs')
+    parser.add_argument('--cache-entries', type=int, default=5000)
+    parser.add_argument('--only', choices=COMPONENTS, help='run one component in this process')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report here')
+    args = parser.parse_args()
+
+    if args.only:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = {args.only: run_component(args, args.only, tmp)}
+    else:
+        results = {name: run_in_subprocess(args, name) for name in COMPONENTS}
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from shared_state import SharedState
+from atomic_json import write_json
+
+def _sorted(values) -> List:
+    try:
+        return sorted(values)
+    except TypeError:
+        return sorted(values, key=str)
+
+class BlacklistStore:
+    """Set-backed blacklists persisted as a snapshot plus an append-only change log.
+
+    Every change is one short line appended to ``<snapshot>.log``; the log is
+    folded back into the snapshot once it grows past compact_after entries.
+    With a shared backend the lists live there instead: every change bumps a
+    shared version number and other processes re-read the lists when they
+    see it move (checked at most every sync_interval seconds). The local
+    files are still written unless the backend is durable, since a
+    process-local backend forgets everything on restart.
+    """
+
+    def __init__(self, snapshot_file: str, lists: Iterable[str], compact_after: int = 1000,
+                 shared: Optional[SharedState] = None, namespace: str = 'blacklist', sync_interval: float = 1.0):
+        self.snapshot_file = snapshot_file
+        self.log_file = f"{snapshot_file}.log"
+        self.compact_after = compact_after
+        self.sets = {name: set() for name in lists}
+        # Anything else in the snapshot file (other UserActivity data) is kept as is
+        self.extra = {}
+        self.log_entries = 0
+        # Called as listener(op, name, values) with op '+' or '-' after every change
+        self.listeners = []
+        self.shared = shared
+        self.namespace = namespace
+        self.sync_interval = sync_interval
+        self.version = None
+        self.last_sync = 0.0
+        self.load_data()
+        if shared is not None:
+            self._attach_shared()
+
+    def subscribe(self, listener: Callable[[str, str, List], None]):
+        self.listeners.append(listener)
+
+    def _notify(self, op: str, name: str, values: List):
+        for listener in self.listeners:
+            listener(op, name, values)
+
+    def load_data(self):
+        try:
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r') as f:
+                    data = json.load(f)
+                for key, value in data.items():
+                    if key in self.sets:
+                        self.sets[key] = set(value)
+                    else:
+                        self.extra[key] = value
+        except Exception as e:
+            print(f"Error loading blacklist snapshot: {e}")
+
+        try:
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r') as f:
+                    for line in f:
+                        self._replay(line)
+        except Exception as e:
+            print(f"Error loading blacklist log: {e}")
+
+    def _replay(self, line: str):
+        try:
+            op, name, value = json.loads(line)
+        except ValueError:
+            # A torn last line from a crash mid-write; everything before it is intact
+            return
+        if name not in self.sets:
+            return
+        if op == '+':
+            self.sets[name].add(value)
+        elif op == '-':
+            self.sets[name].discard(value)
+        self.log_entries += 1
+
+    def _attach_shared(self):
+        if self.shared.get(self.namespace, 'version') is None and not any(self.shared.keys(self._ns(name)) for name in self.sets):
+            # First process on an empty backend seeds it from the local files
+            for name, values in self.sets.items():
+                for value in values:
+                    self.shared.set(self._ns(name), self._member(value), True)
+            self.shared.incr(self.namespace, 'version')
+        self._pull()
+
+    def _ns(self, name: str) -> str:
+        return f"{self.namespace}:{name}"
+
+    def _member(self, value) -> str:
+        return json.dumps(value, separators=(',', ':'))
+
+    def _pull(self):
+        self.version = self.shared.get(self.namespace, 'version')
+        self.last_sync = time.monotonic()
+        for name, local in self.sets.items():
+            current = {json.loads(member) for member in self.shared.keys(self._ns(name))}
+            added, removed = list(current - local), list(local - current)
+            self.sets[name] = current
+            if added:
+                self._notify('+', name, added)
+            if removed:
+                self._notify('-', name, removed)
+
+    def sync(self):
+        """Pick up changes made by other processes; a no-op without a shared backend"""
+        if self.shared is None or time.monotonic() - self.last_sync < self.sync_interval:
+            return
+        self.last_sync = time.monotonic()
+        if self.shared.get(self.namespace, 'version') != self.version:
+            self._pull()
+
+    def _claim(self, op: str, name: str, values: List) -> List:
+        """The values this process actually changed; with a shared backend another process may have got there first"""
+        if self.shared is None:
+            return values
+        ns = self._ns(name)
+        if op == '+':
+            claimed = [value for value in values if self.shared.compare_and_set(ns, self._member(value), None, True)]
+        else:
+            claimed = [value for value in values if self.shared.delete(ns, self._member(value))]
+        if len(claimed) < len(values):
+            # The rest were changed elsewhere; re-read on the next sync
+            self.last_sync = 0.0
+        return claimed
+
+    def _publish(self):
+        version = self.shared.incr(self.namespace, 'version')
+        if version == (self.version or 0) + 1:
+            self.version = version
+        else:
+            # Someone else changed the lists too; re-read on the next sync
+            self.last_sync = 0.0
+
+    def _append(self, entries: List):
+        if self.shared is not None:
+            # Membership was already written by _claim; just tell the other processes
+            self._publish()
+            if self.shared.durable:
+                return
+        try:
+            with open(self.log_file, 'a') as f:
+                f.write(''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries))
+        except Exception as e:
+            print(f"Error writing blacklist log: {e}")
+        self.log_entries += len(entries)
+        if self.log_entries >= self.compact_after:
+            self.compact()
+
+    def compact(self):
+        try:
+            data = dict(self.extra)
+            for name, values in self.sets.items():
+                data[name] = _sorted(values)
+            write_json(self.snapshot_file, data, indent=2)
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+            self.log_entries = 0
+        except Exception as e:
+            print(f"Error compacting blacklist: {e}")
+
+    def contains(self, name: str, value) -> bool:
+        if self.shared is not None:
+            self.sync()
+        return value in self.sets[name]
+
+    def add(self, name: str, value) -> bool:
+        self.sync()
+        if value in self.sets[name] or not self._claim('+', name, [value]):
+            return False
+        self.sets[name].add(value)
+        self._append([['+', name, value]])
+        self._notify('+', name, [value])
+        return True
+
+    def remove(self, name: str, value) -> bool:
+        self.sync()
+        if value not in self.sets[name] or not self._claim('-', name, [value]):
+            return False
+        self.sets[name].discard(value)
+        self._append([['-', name, value]])
+        self._notify('-', name, [value])
+        return True
+
+    def bulk_add(self, name: str, values: Iterable) -> int:
+        self.sync()
+        added = self._claim('+', name, [value for value in set(values) if value not in self.sets[name]])
+        self.sets[name].update(added)
+        if added:
+            self._append([['+', name, value] for value in added])
+            self._notify('+', name, added)
+        return len(added)
+
+    def bulk_remove(self, name: str, values: Iterable) -> int:
+        self.sync()
+        removed = self._claim('-', name, [value for value in set(values) if value in self.sets[name]])
+        self.sets[name].difference_update(removed)
+        if removed:
+            self._append([['-', name, value] for value in removed])
+            self._notify('-', name, removed)
+        return len(removed)
+
+    def export(self, name: str) -> List:
+        self.sync()
+        return _sorted(self.sets[name])
+
+    def size(self, name: str) -> int:
+        return len(self.sets[name])
+
+    def get_stats(self) -> Dict:
+        return {
+            'lists': {name: len(values) for name, values in self.sets.items()},
+            'log_entries': self.log_entries,
+            'shared_version': self.version
+        }
@@ -1,179 +1,595 @@
 import aiohttp
-from urllib.parse import quote
+import asyncio
+import json
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, List, AsyncIterator
+from provider_stats import ProviderStats
+from circuit_breaker import CircuitBreaker
+from routing_index import RoutingIndex
+from single_flight import SingleFlight
+from provider_limits import ProviderLimiter
+from session_pool import SessionPool
+from link_normalizer import check_link, cache_key, UNSUPPORTED_LINK
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+PROVIDER_ORDER = ['bypass-vip', 'ace-bypass', 'trw-bypass', 'zen-bypass', 'eas-bypass']
+STRATEGIES = ('sequential', 'hedged', 'race')
+
+# Overridable per provider (e.g. to point at a local fake server for load tests)
+PROVIDER_BASE_URLS = {
+    'bypass-vip': 'https://api.bypass.vip',
+    'ace-bypass': 'http://ace-bypass.com',
+    'trw-bypass': 'https://trw.lat',
+    'zen-bypass': 'https://zen.gbrl.org',
+    'eas-bypass': 'https://api.eas-x.com'
+}
+
+def _status_schema(data: dict) -> Optional[tuple]:
+    # ZEN/EAS-X/Bypass VIP format: {"status": "success", "result": "..." or [loadstring, url]}
+    if data.get('status') != 'success':
+        return None
+    result_data = data.get('result')
+    if isinstance(result_data, list) and len(result_data) > 0:
+        loadstring = result_data[0] if isinstance(result_data[0], str) else None
+        bypassed_url = result_data[1] if len(result_data) > 1 else None
+        return loadstring, bypassed_url
+    return (result_data if isinstance(result_data, str) else None), None
+
+def _flat_schema(data: dict) -> Optional[tuple]:
+    # Standard format for Ace/TRW: content in top-level keys
+    if data.get('status') == 'success':
+        return None
+    loadstring = data.get('loadstring') or data.get('script') or data.get('code')
+    bypassed_url = data.get('destination') or data.get('result') or data.get('bypassed_url') or data.get('url')
+    if not loadstring and not bypassed_url:
+        return None
+    return loadstring, bypassed_url
+
+# Each provider's own format is tried first; the other is a fallback in case it changes
+PROVIDER_SCHEMAS = {
+    'bypass-vip': (_status_schema, _flat_schema),
+    'ace-bypass': (_flat_schema, _status_schema),
+    'trw-bypass': (_flat_schema, _status_schema),
+    'zen-bypass': (_status_schema, _flat_schema),
+    'eas-bypass': (_status_schema, _flat_schema)
+}
+DEFAULT_SCHEMAS = (_status_schema, _flat_schema)
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
 class BypassProvider:
-    def __init__(self, bypass_api_key: Optional[str] = None, trw_api_key: Optional[str] = None, zen_api_key: Optional[str] = None, eas_api_key: Optional[str] = None, bypass_vip_api_key: Optional[str] = None):
+    def __init__(self, bypass_api_key: Optional[str] = None, trw_api_key: Optional[str] = None, zen_api_key: Optional[str] = None, eas_api_key: Optional[str] = None, bypass_vip_api_key: Optional[str] = None,
+                 strategy: Optional[str] = None, hedge_percentile: float = 0.95, hedge_delay: float = 5.0, deadline: Optional[float] = None,
+                 adaptive: bool = True, stats_file: str = 'provider_stats.json',
+                 breaker_threshold: int = 5, breaker_reset_timeout: float = 30.0,
+                 routing_file: str = 'routing_index.json', negative_ttl: float = 10.0,
+                 provider_limits: Optional[Dict[str, Dict]] = None,
+                 pool_options: Optional[Dict] = None, prewarm: bool = False, keep_raw_data: bool = True,
+                 base_urls: Optional[Dict[str, str]] = None):
         self.bypass_api_key = bypass_api_key or os.getenv('BYPASS_API_KEY')
         self.trw_api_key = trw_api_key or os.getenv('TRW_API_KEY')
         self.zen_api_key = zen_api_key or os.getenv('ZEN_API_KEY')
         self.eas_api_key = eas_api_key or os.getenv('EAS_API_KEY')
         self.bypass_vip_api_key = bypass_vip_api_key or os.getenv('BYPASS_VIP_API_KEY')
+        self.base_urls = {**PROVIDER_BASE_URLS, **(base_urls or {})}
+        
+        # Dispatch strategy: 'sequential' (one provider at a time), 'hedged' (start the
+        # next provider once the current one is slower than its usual latency) or
+        # 'race' (fire every keyed provider at once and keep the first success)
+        self.strategy = strategy or os.getenv('BYPASS_STRATEGY', 'sequential')
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown bypass strategy: {self.strategy}")
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.deadline = deadline
+        
+        # Rolling per-provider success/latency history; with adaptive ordering the
+        # chain is re-ranked for every request so the fastest reliable provider goes first
+        self.adaptive = adaptive
+        self.stats = ProviderStats(stats_file)
+        
+        # A provider that keeps timing out or erroring is skipped instantly until
+        # its breaker lets a single probe request through again
+        self.breakers = {provider: CircuitBreaker(breaker_threshold, breaker_reset_timeout) for provider in PROVIDER_ORDER}
+        
+        # Learned per-shortener routing: providers that said a link pattern is
+        # "not supported" are skipped for that pattern until the evidence decays
+        self.routes = RoutingIndex(routing_file)
+        
+        # Concurrent requests for the same link share one upstream call, and a
+        # failed link is answered from memory for negative_ttl seconds
+        self.flights = SingleFlight(negative_ttl)
+        
+        # Outbound concurrency and request-per-second caps, e.g.
+        # {'zen-bypass': {'concurrency': 4, 'rps': 2, 'max_wait': 1.0}};
+        # providers not listed are unlimited apart from honouring Retry-After
+        provider_limits = provider_limits or {}
+        self.limits = {provider: ProviderLimiter(**provider_limits.get(provider, {})) for provider in PROVIDER_ORDER}
+        
+        # Long-lived pooled session used whenever the caller doesn't pass one; it only
+        # exists between start() and close() (or inside "async with"), so it is always closed
+        self.pool = SessionPool(**(pool_options or {}))
+        self.started = False
+        self.prewarm = prewarm
+        
+        # raw_data is the provider's full JSON reply; dropping it keeps cached results small
+        self.keep_raw_data = keep_raw_data
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def start(self):
+        self.started = True
+        self.pool.get_session()
+        if self.prewarm:
+            await self.pool.prewarm(self._origins())
     
-    async def bypass(self, link: str, session: aiohttp.ClientSession, timeout: int = 30) -> dict:
+    async def close(self):
+        self.started = False
+        await self.pool.close()
+        self.save_stats()
+    
+    def _origins(self) -> List[str]:
+        origins = []
+        for request in self._build_requests('https://example.com'):
+            parts = urlsplit(request['url'])
+            origin = f"{parts.scheme}://{parts.netloc}/"
+            if origin not in origins:
+                origins.append(origin)
+        return origins
+    
+    def _build_requests(self, link: str) -> List[Dict]:
         encoded_link = quote(link)
-        errors = []
+        base_urls = self.base_urls
+        requests = []
         
-        # Try Bypass VIP first if API key is available (premium service)
+        # Bypass VIP is the premium service and goes first
         if self.bypass_vip_api_key:
-            bypass_vip_url = f"https://api.bypass.vip/premium/bypass?url={encoded_link}"
-            result = await self._try_api_get(bypass_vip_url, session, timeout, 'Bypass VIP', headers={'x-api-key': self.bypass_vip_api_key})
-            if result['success']:
-                return result
-            else:
-                errors.append(f"Bypass VIP: {result.get('error', 'Unknown error')}")
+            requests.append({
+                'provider': 'bypass-vip',
+                'api_name': 'Bypass VIP',
+                'method': 'GET',
+                'url': f"{base_urls['bypass-vip']}/premium/bypass?url={encoded_link}",
+                'headers': {'x-api-key': self.bypass_vip_api_key}
+            })
         
-        # Try Ace Bypass if Bypass VIP failed or wasn't available
         if self.bypass_api_key:
-            ace_url = f"http://ace-bypass.com/api/bypass?url={encoded_link}&apikey={self.bypass_api_key}"
-            result = await self._try_api_get(ace_url, session, timeout, 'Ace Bypass')
-            if result['success']:
-                return result
-            else:
-                errors.append(f"Ace Bypass: {result.get('error', 'Unknown error')}")
+            requests.append({
+                'provider': 'ace-bypass',
+                'api_name': 'Ace Bypass',
+                'method': 'GET',
+                'url': f"{base_urls['ace-bypass']}/api/bypass?url={encoded_link}&apikey={self.bypass_api_key}",
+                'headers': None
+            })
         
-        # Fallback to TRW Bypass if previous attempts failed or weren't available
         if self.trw_api_key:
-            trw_url = f"https://trw.lat/api/bypass?url={encoded_link}"
-            result = await self._try_api_get(trw_url, session, timeout, 'TRW Bypass', headers={'x-api-key': self.trw_api_key})
-            if result['success']:
-                return result
-            else:
-                errors.append(f"TRW Bypass: {result.get('error', 'Unknown error')}")
+            requests.append({
+                'provider': 'trw-bypass',
+                'api_name': 'TRW Bypass',
+                'method': 'GET',
+                'url': f"{base_urls['trw-bypass']}/api/bypass?url={encoded_link}",
+                'headers': {'x-api-key': self.trw_api_key}
+            })
         
-        # Fallback to ZEN API if TRW failed or wasn't available
         if self.zen_api_key:
-            zen_url = f"https://zen.gbrl.org/v1/bypass?url={encoded_link}"
-            result = await self._try_api_get(zen_url, session, timeout, 'ZEN Bypass', headers={'x-api-key': self.zen_api_key})
-            if result['success']:
-                return result
-            else:
-                errors.append(f"ZEN Bypass: {result.get('error', 'Unknown error')}")
+            requests.append({
+                'provider': 'zen-bypass',
+                'api_name': 'ZEN Bypass',
+                'method': 'GET',
+                'url': f"{base_urls['zen-bypass']}/v1/bypass?url={encoded_link}",
+                'headers': {'x-api-key': self.zen_api_key}
+            })
         
-        # Fallback to EAS-X API if ZEN failed or wasn't available
         if self.eas_api_key:
-            eas_url = "https://api.eas-x.com/v3/bypass"
-            result = await self._try_api_post(eas_url, session, timeout, 'EAS-X Bypass', 
-                                             headers={'eas-api-key': self.eas_api_key},
-                                             json_data={'url': link})
-            if result['success']:
-                return result
+            requests.append({
+                'provider': 'eas-bypass',
+                'api_name': 'EAS-X Bypass',
+                'method': 'POST',
+                'url': f"{base_urls['eas-bypass']}/v3/bypass",
+                'headers': {'eas-api-key': self.eas_api_key},
+                'json_data': {'url': link}
+            })
+        
+        return requests
+    
+    async def bypass(self, link: str, session: Optional[aiohttp.ClientSession] = None, timeout: int = 30, strategy: Optional[str] = None, deadline: Optional[float] = None) -> dict:
+        """Bypass link; a call that joins one already in flight for the same link shares its result, and so its strategy, timeout and deadline.
+
+        Without a session the pooled one is used, which needs start() or "async with provider" first.
+        """
+        strategy = strategy or self.strategy
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown bypass strategy: {strategy}")
+        deadline = deadline if deadline is not None else self.deadline
+        
+        # Rejected before any network I/O: non-URLs and hosts no provider can bypass
+        canonical, error = check_link(link)
+        if error:
+            return {
+                'success': False,
+                'error': error,
+                'api_name': 'None',
+                'unsupported': error == UNSUPPORTED_LINK
+            }
+        
+        # The canonical form only keys the cache and coalescing; providers get the link as the user sent it
+        link = link.strip()
+        if session is None:
+            if not self.started:
+                raise RuntimeError("bypass() needs a session unless the provider was started with start() or 'async with'")
+            session = self.pool.get_session()
+        return await self.flights.do(cache_key(canonical),
+                                     lambda: self._bypass(link, session, timeout, strategy, deadline))
+    
+    def cache_key(self, link: str) -> str:
+        """Key shared by request coalescing and result caching for a link"""
+        return cache_key(link)
+    
+    async def bypass_many(self, links: List[str], session: Optional[aiohttp.ClientSession] = None, timeout: int = 30,
+                          concurrency: int = 8, cache=None) -> AsyncIterator[Dict]:
+        """Bypass a batch of links, yielding {'index', 'link', 'result', 'cached'} in completion order"""
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+        # Duplicates (after normalisation) are bypassed once and reported for every index
+        indexes = {}
+        for index, link in enumerate(links):
+            if not link or not link.strip():
+                yield {
+                    'index': index,
+                    'link': link,
+                    'result': {'success': False, 'error': 'Empty link', 'api_name': 'None'},
+                    'cached': False
+                }
+                continue
+            indexes.setdefault(self.cache_key(link), []).append(index)
+        
+        pending = []
+        for key, key_indexes in indexes.items():
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                for index in key_indexes:
+                    yield {'index': index, 'link': links[index], 'result': cached, 'cached': True}
             else:
-                errors.append(f"EAS-X Bypass: {result.get('error', 'Unknown error')}")
+                pending.append(key)
+        if not pending:
+            return
         
-        # If we get here, all failed or no keys configured
-        error_msg = ' | '.join(errors) if errors else 'No API keys configured for bypass services'
-        return {
+        work = asyncio.Queue()
+        for key in pending:
+            work.put_nowait(key)
+        results = asyncio.Queue()
+        
+        async def worker():
+            while True:
+                try:
+                    key = work.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                link = links[indexes[key][0]]
+                try:
+                    result = await self.bypass(link, session, timeout)
+                except Exception as e:
+                    result = {'success': False, 'error': f'Bypass failed: {str(e)}', 'api_name': 'All providers failed'}
+                if cache and result['success']:
+                    cache.set(key, result)
+                await results.put((key, result))
+        
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(pending)))]
+        try:
+            for _ in range(len(pending)):
+                key, result = await results.get()
+                for index in indexes[key]:
+                    yield {'index': index, 'link': links[index], 'result': result, 'cached': False}
+        finally:
+            # The caller may stop iterating early; don't leave workers running
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _bypass(self, link: str, session: aiohttp.ClientSession, timeout: float, strategy: str, deadline: Optional[float]) -> dict:
+        requests = self._order_requests(self._build_requests(link))
+        if not requests:
+            return {
+                'success': False,
+                'error': 'No API keys configured for bypass services',
+                'api_name': 'All providers failed'
+            }
+        
+        route = self.routes.pattern_for(link)
+        if route:
+            routable = [request for request in requests if not self.routes.is_rejected(route, request['provider'])]
+            if not routable:
+                return {
+                    'success': False,
+                    'error': 'Link not supported by any configured service',
+                    'api_name': 'All providers failed',
+                    'unsupported': True
+                }
+            # Providers already known to handle this pattern go first
+            requests = sorted(routable, key=lambda request: not self.routes.has_succeeded(route, request['provider']))
+            for request in requests:
+                request['route'] = route
+        
+        return await self._dispatch(requests, session, timeout, strategy, deadline)
+    
+    def _order_requests(self, requests: List[Dict]) -> List[Dict]:
+        if not self.adaptive:
+            return requests
+        ranking = self.stats.rank([request['provider'] for request in requests], self.hedge_delay)
+        return sorted(requests, key=lambda request: ranking.index(request['provider']))
+    
+    async def _dispatch(self, requests: List[Dict], session: aiohttp.ClientSession, timeout: float, strategy: str, deadline: Optional[float]) -> dict:
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + deadline if deadline is not None else None
+        queue = list(requests)
+        pending = {}
+        errors = []
+        last_launched = None
+        # Stays True only if every provider gave a real answer (an error reply or "unsupported"),
+        # i.e. the failure doesn't depend on this caller's timeout/deadline or a passing condition
+        definitive = True
+        
+        def launch():
+            nonlocal last_launched
+            request = queue.pop(0)
+            hop_timeout = timeout
+            if end_time is not None:
+                hop_timeout = max(0.0, min(timeout, end_time - loop.time()))
+            task = asyncio.ensure_future(self._call_provider(request, session, hop_timeout))
+            pending[task] = request
+            last_launched = request
+        
+        try:
+            while queue or pending:
+                if strategy == 'race':
+                    while queue:
+                        launch()
+                elif not pending:
+                    launch()
+                
+                wait_time = None
+                if strategy == 'hedged' and queue:
+                    wait_time = self._hedge_delay(last_launched['provider'])
+                if end_time is not None:
+                    remaining = end_time - loop.time()
+                    if remaining <= 0:
+                        errors.append(f"Deadline of {deadline}s exceeded")
+                        definitive = False
+                        break
+                    wait_time = remaining if wait_time is None else min(wait_time, remaining)
+                
+                done, _ = await asyncio.wait(pending, timeout=wait_time, return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    # Either the hedge delay elapsed or the global deadline did
+                    if strategy == 'hedged' and queue and (end_time is None or loop.time() < end_time):
+                        launch()
+                        continue
+                    errors.append(f"Deadline of {deadline}s exceeded")
+                    definitive = False
+                    break
+                
+                for task in done:
+                    request = pending.pop(task)
+                    result = task.result()
+                    if result['success']:
+                        return result
+                    errors.append(f"{request['api_name']}: {result.get('error', 'Unknown error')}")
+                    if not self._is_definitive(result):
+                        definitive = False
+                    # A failed hedge frees its slot for the next provider straight away
+                    if strategy == 'hedged' and queue and pending:
+                        launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        # If we get here, all failed or the deadline was hit
+        result = {
             'success': False,
-            'error': error_msg,
+            'error': ' | '.join(errors),
             'api_name': 'All providers failed'
         }
+        if definitive:
+            result['definitive'] = True
+        return result
+    
+    def _is_definitive(self, result: Dict) -> bool:
+        if result.get('unsupported'):
+            return True
+        return not (result.get('circuit_open') or result.get('budget_exhausted') or result.get('transport_error')
+                    or result.get('retry_after') is not None)
+    
+    async def _call_provider(self, request: Dict, session: aiohttp.ClientSession, timeout: float) -> dict:
+        breaker = self.breakers[request['provider']]
+        if not breaker.allow_request():
+            return {
+                'success': False,
+                'error': f"{request['api_name']}: temporarily disabled after repeated failures",
+                'api_name': request['api_name'],
+                'circuit_open': True
+            }
+        
+        limiter = self.limits[request['provider']]
+        try:
+            if not await limiter.acquire():
+                return {
+                    'success': False,
+                    'error': f"{request['api_name']}: request budget exhausted, skipped",
+                    'api_name': request['api_name'],
+                    'budget_exhausted': True
+                }
+            started = time.monotonic()
+            try:
+                if request['method'] == 'POST':
+                    result = await self._try_api_post(request['url'], session, timeout, request['api_name'],
+                                                      headers=request['headers'],
+                                                      json_data=request.get('json_data'),
+                                                      provider=request['provider'])
+                else:
+                    result = await self._try_api_get(request['url'], session, timeout, request['api_name'],
+                                                     headers=request['headers'], provider=request['provider'])
+            finally:
+                limiter.release()
+        finally:
+            breaker.release()
+        
+        # Any parsed reply (even "unsupported") means the provider itself is up;
+        # a 429 only tells us to back off, so it leaves the breaker alone
+        if result.get('retry_after') is not None:
+            limiter.block_for(result['retry_after'])
+        elif result.get('provider_error'):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        self.stats.record(request['provider'], result['success'], time.monotonic() - started,
+                          unsupported=result.get('unsupported', False))
+        if request.get('route'):
+            self.routes.record(request['route'], request['provider'], result['success'], result.get('unsupported', False))
+        return result
     
-    async def _try_api_get(self, api_url: str, session: aiohttp.ClientSession, timeout: int, api_name: str, headers: Optional[Dict] = None) -> dict:
+    def _hedge_delay(self, provider: str) -> float:
+        delay = self.stats.latency_percentile(provider, self.hedge_percentile)
+        return delay if delay is not None else self.hedge_delay
+    
+    async def _try_api_get(self, api_url: str, session: aiohttp.ClientSession, timeout: int, api_name: str, headers: Optional[Dict] = None, provider: Optional[str] = None) -> dict:
         try:
             async with session.get(
                 api_url,
                 headers=headers,
-                timeout=aiohttp.ClientTimeout(total=timeout)
+                timeout=self.pool.timeout(timeout)
             ) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    return self._parse_response(data, api_name)
+                    data = _loads(await response.read())
+                    return self._parse_response(data, api_name, provider)
                 else:
-                    error_text = await response.text()
-                    return {
-                        'success': False,
-                        'error': f'{api_name} error {response.status}: {error_text[:200]}',
-                        'api_name': api_name
-                    }
+                    return await self._error_response(response, api_name)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'{api_name} failed: {str(e)}',
-                'api_name': api_name
+                'api_name': api_name,
+                'provider_error': True,
+                # Timeouts and connection errors depend on the caller's timeout, not on the link
+                'transport_error': True
             }
     
-    async def _try_api_post(self, api_url: str, session: aiohttp.ClientSession, timeout: int, api_name: str, headers: Optional[Dict] = None, json_data: Optional[Dict] = None) -> dict:
+    async def _try_api_post(self, api_url: str, session: aiohttp.ClientSession, timeout: int, api_name: str, headers: Optional[Dict] = None, json_data: Optional[Dict] = None, provider: Optional[str] = None) -> dict:
         try:
             async with session.post(
                 api_url,
                 headers=headers,
                 json=json_data,
-                timeout=aiohttp.ClientTimeout(total=timeout)
+                timeout=self.pool.timeout(timeout)
             ) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    return self._parse_response(data, api_name)
+                    data = _loads(await response.read())
+                    return self._parse_response(data, api_name, provider)
                 else:
-                    error_text = await response.text()
-                    return {
-                        'success': False,
-                        'error': f'{api_name} error {response.status}: {error_text[:200]}',
-                        'api_name': api_name
-                    }
+                    return await self._error_response(response, api_name)
         except Exception as e:
             return {
                 'success': False,
                 'error': f'{api_name} failed: {str(e)}',
-                'api_name': api_name
+                'api_name': api_name,
+                'provider_error': True,
+                # Timeouts and connection errors depend on the caller's timeout, not on the link
+                'transport_error': True
             }
     
-    def _parse_response(self, data: dict, api_name: str) -> dict:
-        # Try to extract loadstring and bypassed_url from various response formats
-        loadstring = None
-        bypassed_url = None
-        
-        # Check for ZEN/EAS-X API format: {"status": "success", "result": "..."}
-        if data.get('status') == 'success':
-            result_data = data.get('result')
-            if isinstance(result_data, list) and len(result_data) > 0:
-                loadstring = result_data[0] if isinstance(result_data[0], str) else None
-                bypassed_url = result_data[1] if len(result_data) > 1 else None
-            else:
-                loadstring = result_data if isinstance(result_data, str) else None
-        elif data.get('status') == 'error' or data.get('status') == 'fail':
-            error_msg = data.get('message') or data.get('error') or 'Unknown error'
-            if 'not supported' in error_msg.lower() or 'unsupported' in error_msg.lower():
-                return {
-                    'success': False,
-                    'error': f'{api_name}: Link not supported by this service',
-                    'api_name': api_name,
-                    'unsupported': True
-                }
+    async def _error_response(self, response: aiohttp.ClientResponse, api_name: str) -> dict:
+        error_text = await response.text()
+        result = {
+            'success': False,
+            'error': f'{api_name} error {response.status}: {error_text[:200]}',
+            'api_name': api_name,
+            # Being rate limited says nothing about the provider being down
+            'provider_error': response.status != 429
+        }
+        if response.status == 429:
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            # "Retry-After: 0" means retry now; only a missing or unparseable header falls back to 1s
+            result['retry_after'] = 1.0 if retry_after is None else retry_after
+        return result
+    
+    def _parse_response(self, data: dict, api_name: str, provider: Optional[str] = None) -> dict:
+        if not isinstance(data, dict):
             return {
                 'success': False,
-                'error': f'{api_name}: {error_msg}',
+                'error': f'{api_name}: Unexpected response format',
                 'api_name': api_name
             }
-        else:
-            # Standard format for Ace/TRW
-            loadstring = data.get('loadstring') or data.get('script') or data.get('code')
-            bypassed_url = data.get('destination') or data.get('result') or data.get('bypassed_url') or data.get('url')
+        
+        loadstring = None
+        bypassed_url = None
+        
+        status = data.get('status')
+        if status == 'error' or status == 'fail':
+            return self._error_result(data.get('message') or data.get('error') or 'Unknown error', api_name)
+        
+        for schema in PROVIDER_SCHEMAS.get(provider, DEFAULT_SCHEMAS):
+            extracted = schema(data)
+            if extracted is not None:
+                loadstring, bypassed_url = extracted
+                break
         
         # Check if we actually got content
         if not loadstring and not bypassed_url:
-            error_msg = data.get('message') or data.get('error') or 'No content returned'
-            if 'not supported' in error_msg.lower() or 'unsupported' in error_msg.lower():
-                return {
-                    'success': False,
-                    'error': f'{api_name}: Link not supported by this service',
-                    'api_name': api_name,
-                    'unsupported': True
-                }
-            return {
-                'success': False,
-                'error': f'{api_name}: {error_msg}',
-                'api_name': api_name
-            }
+            return self._error_result(data.get('message') or data.get('error') or 'No content returned', api_name)
         
-        return {
+        result = {
             'success': True,
             'loadstring': loadstring,
             'bypassed_url': bypassed_url,
-            'raw_data': data,
             'api_name': api_name
         }
+        if self.keep_raw_data:
+            result['raw_data'] = data
+        return result
+    
+    def _error_result(self, error_msg, api_name: str) -> dict:
+        error_msg = str(error_msg)
+        if 'not supported' in error_msg.lower() or 'unsupported' in error_msg.lower():
+            return {
+                'success': False,
+                'error': f'{api_name}: Link not supported by this service',
+                'api_name': api_name,
+                'unsupported': True
+            }
+        return {
+            'success': False,
+            'error': f'{api_name}: {error_msg}',
+            'api_name': api_name
+        }
+    
+    def save_stats(self):
+        self.stats.flush()
+        self.routes.flush()
     
     def set_api_key(self, provider: str, api_key: str):
         """Update API key for a specific provider"""
@@ -190,7 +606,13 @@ class BypassProvider:
     
     def get_api_status(self) -> dict:
         status = {
-            'active': 'Multi-API (Bypass VIP → Ace → TRW → ZEN → EAS-X fallback)',
+            'active': 'Multi-API (adaptive order by success rate and latency)' if self.adaptive else 'Multi-API (Bypass VIP → Ace → TRW → ZEN → EAS-X fallback)',
+            'strategy': self.strategy,
+            'deadline': self.deadline,
+            'adaptive': self.adaptive,
+            'coalescing': self.flights.get_stats(),
+            'connections': self.pool.get_stats(),
+            'order': self.stats.rank(PROVIDER_ORDER, self.hedge_delay) if self.adaptive else list(PROVIDER_ORDER),
             'providers': {
                 'bypass-vip': {
                     'name': 'Bypass VIP',
@@ -230,4 +652,10 @@ class BypassProvider:
             }
         }
         
+        for provider, info in status['providers'].items():
+            info['stats'] = self.stats.get_stats(provider)
+            info['circuit'] = self.breakers[provider].get_state()
+            info['limits'] = self.limits[provider].get_stats()
+            info['ready'] = info['ready'] and info['circuit']['state'] != CircuitBreaker.OPEN
+        
         return status
@@ -1,22 +1,254 @@
+import heapq
+import json
+import sqlite3
 import time
-from typing import Optional, Dict
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from shared_state import SharedState
 
 class CacheManager:
-    def __init__(self, ttl_minutes: int = 30):
-        self.cache = {}
+    def __init__(self, ttl_minutes: int = 30, max_entries: int = 5000, max_bytes: int = 32 * 1024 * 1024,
+                 disk_path: Optional[str] = None, sweep_batch: int = 16, stale_minutes: int = 30,
+                 shared: Optional[SharedState] = None, namespace: str = 'cache'):
+        # key -> (value, timestamp, size); ordered least to most recently used
+        self.cache = OrderedDict()
+        # Min-heap of (timestamp, key). Entries promoted from disk or the shared tier keep their
+        # original write time, so insertion order is not expiry order. Overwritten and removed
+        # keys are left in the heap and skipped when they surface
+        self.expiry_heap = []
         self.ttl = ttl_minutes * 60
-    
+        # Expired entries are kept this much longer so they can be served stale while refreshing
+        self.stale_ttl = stale_minutes * 60
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_batch = sweep_batch
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.synced_hits = 0
+
+        # Optional on-disk second tier so hot results survive restarts
+        self.db = None
+        self.last_disk_sweep = time.time()
+        if disk_path:
+            try:
+                self.db = sqlite3.connect(disk_path, check_same_thread=False)
+                self.db.execute('PRAGMA journal_mode=WAL')
+                self.db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, timestamp REAL NOT NULL)')
+                self.db.commit()
+            except Exception as e:
+                print(f"Error opening cache database: {e}")
+                self.db = None
+
+        # Optional shared tier so results bypassed by one shard are hits in every other
+        self.shared = shared
+        self.namespace = namespace
+
     def get(self, key: str) -> Optional[Dict]:
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.ttl:
-                return data
-            else:
-                del self.cache[key]
+        entry = self.get_stale(key, count=False)
+        if entry is not None and entry[1] < self.ttl:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
         return None
-    
+
+    def get_stale(self, key: str, count: bool = True) -> Optional[Tuple[Dict, float]]:
+        """Return (value, age in seconds) for fresh and stale-but-servable entries"""
+        self._sweep()
+        max_age = self.ttl + self.stale_ttl
+        entry = self.cache.get(key)
+        if entry is not None:
+            data, timestamp, _ = entry
+            age = time.time() - timestamp
+            if age < max_age:
+                self.cache.move_to_end(key)
+                if count:
+                    self._count(age)
+                return data, age
+            self._remove(key)
+            self.expirations += 1
+
+        entry = self._disk_get(key, max_age)
+        if entry is None:
+            entry = self._shared_get(key, max_age)
+        if entry is not None:
+            if count:
+                self._count(entry[1])
+            return entry
+
+        if count:
+            self.misses += 1
+        return None
+
+    def _count(self, age: float):
+        if age < self.ttl:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+
+    def expires_in(self, key: str) -> Optional[float]:
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        return self.ttl - (time.time() - entry[1])
+
     def set(self, key: str, value: Dict):
-        self.cache[key] = (value, time.time())
-    
+        timestamp = time.time()
+        self._store(key, value, timestamp)
+        self._disk_set(key, value)
+        if self.shared is not None:
+            self.shared.set(self.namespace, key, [value, timestamp], self.ttl + self.stale_ttl)
+        self._sweep()
+
+    def delete(self, key: str):
+        if key in self.cache:
+            self._remove(key)
+        if self.shared is not None:
+            self.shared.delete(self.namespace, key)
+        if self.db:
+            try:
+                self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.db.commit()
+            except Exception as e:
+                print(f"Error deleting from cache database: {e}")
+
     def clear(self):
         self.cache.clear()
+        self.expiry_heap.clear()
+        self.total_bytes = 0
+        if self.shared is not None:
+            self.shared.clear(self.namespace)
+        if self.db:
+            try:
+                self.db.execute('DELETE FROM cache')
+                self.db.commit()
+            except Exception as e:
+                print(f"Error clearing cache database: {e}")
+
+    def close(self):
+        if self.db:
+            self.db.close()
+            self.db = None
+
+    def _store(self, key: str, value: Dict, timestamp: float):
+        if key in self.cache:
+            self._remove(key)
+        size = self._size_of(key, value)
+        if size > self.max_bytes:
+            return
+        self.cache[key] = (value, timestamp, size)
+        heapq.heappush(self.expiry_heap, (timestamp, key))
+        self.total_bytes += size
+        if len(self.expiry_heap) > 2 * len(self.cache) + self.sweep_batch:
+            # Too many skipped entries; rebuild from the live ones
+            self.expiry_heap = [(entry[1], cached_key) for cached_key, entry in self.cache.items()]
+            heapq.heapify(self.expiry_heap)
+
+        while len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.cache))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self.cache.pop(key)
+        self.total_bytes -= size
+
+    def _size_of(self, key: str, value: Dict) -> int:
+        try:
+            return len(key) + len(json.dumps(value, separators=(',', ':'), default=str))
+        except (TypeError, ValueError):
+            return len(key) + len(repr(value))
+
+    def _sweep(self):
+        # Amortised TTL sweep: expire at most sweep_batch entries per call
+        cutoff = time.time() - self.ttl - self.stale_ttl
+        for _ in range(self.sweep_batch):
+            if not self.expiry_heap or self.expiry_heap[0][0] > cutoff:
+                break
+            timestamp, key = heapq.heappop(self.expiry_heap)
+            entry = self.cache.get(key)
+            if entry is not None and entry[1] == timestamp:
+                self._remove(key)
+                self.expirations += 1
+
+        if self.db and time.time() - self.last_disk_sweep >= self.ttl + self.stale_ttl:
+            self.last_disk_sweep = time.time()
+            try:
+                self.db.execute('DELETE FROM cache WHERE timestamp <= ?', (cutoff,))
+                self.db.commit()
+            except Exception as e:
+                print(f"Error sweeping cache database: {e}")
+
+    def sweep(self):
+        """Expire every stale entry; call periodically from a background task"""
+        while self.expiry_heap and self.expiry_heap[0][0] <= time.time() - self.ttl - self.stale_ttl:
+            self._sweep()
+
+    def _disk_get(self, key: str, max_age: float) -> Optional[Tuple[Dict, float]]:
+        if not self.db:
+            return None
+        try:
+            row = self.db.execute('SELECT value, timestamp FROM cache WHERE key = ?', (key,)).fetchone()
+        except Exception as e:
+            print(f"Error reading cache database: {e}")
+            return None
+        if not row or time.time() - row[1] >= max_age:
+            return None
+        try:
+            data = json.loads(row[0])
+        except ValueError as e:
+            # A corrupt row is dropped so it is fetched again instead of failing every lookup
+            print(f"Error decoding cached value for {key}: {e}")
+            try:
+                self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self.db.commit()
+            except Exception as e:
+                print(f"Error deleting from cache database: {e}")
+            return None
+        # Promote back into memory, keeping the original write time for TTL
+        self._store(key, data, row[1])
+        return data, time.time() - row[1]
+
+    def _shared_get(self, key: str, max_age: float) -> Optional[Tuple[Dict, float]]:
+        if self.shared is None:
+            return None
+        entry = self.shared.get(self.namespace, key)
+        if entry is None or time.time() - entry[1] >= max_age:
+            return None
+        data, timestamp = entry
+        self._store(key, data, timestamp)
+        return data, time.time() - timestamp
+
+    def _disk_set(self, key: str, value: Dict):
+        if not self.db:
+            return
+        try:
+            self.db.execute('INSERT OR REPLACE INTO cache (key, value, timestamp) VALUES (?, ?, ?)',
+                            (key, json.dumps(value, default=str), time.time()))
+            self.db.commit()
+        except Exception as e:
+            print(f"Error writing cache database: {e}")
+
+    def sync_stats(self, bypass_stats: Dict) -> Dict:
+        """Fold cache hits since the last sync into the bot's cached_hits counter"""
+        served = self.hits + self.stale_hits
+        bypass_stats['cached_hits'] = bypass_stats.get('cached_hits', 0) + served - self.synced_hits
+        self.synced_hits = served
+        return bypass_stats
+
+    def get_stats(self) -> Dict:
+        return {
+            'entries': len(self.cache),
+            'bytes': self.total_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'disk_tier': self.db is not None,
+            'shared_tier': self.shared is not None
+        }
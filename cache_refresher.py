@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import json
+import math
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from atomic_json import update_json_key
+from cache_manager import CacheManager
+from link_normalizer import cache_key
+
+class CacheRefresher:
+    def __init__(self, cache: CacheManager, fetch: Callable[[str], Awaitable[Dict]],
+                 key_fn: Optional[Callable[[str], str]] = None, top_k: int = 50,
+                 refresh_ahead: float = 300.0, half_life: float = 3600.0, max_tracked: int = 10000):
+        self.cache = cache
+        # fetch(link) -> bypass result, e.g. provider.bypass
+        self.fetch = fetch
+        self.key_fn = key_fn or cache_key
+        self.top_k = top_k
+        # Popular entries are refreshed when they have less than this many seconds left
+        self.refresh_ahead = refresh_ahead
+        self.decay = math.log(2) / half_life
+        self.max_tracked = max_tracked
+        # key -> [score, last_seen, link]; score decays exponentially with half_life
+        self.popularity = {}
+        self.refreshing = {}
+
+        self.background_refreshes = 0
+        self.proactive_refreshes = 0
+        self.refresh_failures = 0
+        self.warmed = 0
+
+    async def get(self, link: str) -> Dict:
+        """Serve from cache (stale entries included, refreshed in the background) or fetch"""
+        key = self.key_fn(link)
+        self._track(key, link)
+        entry = self.cache.get_stale(key)
+        if entry is not None:
+            value, age = entry
+            if age >= self.cache.ttl and self._schedule(key, link):
+                self.background_refreshes += 1
+            return value
+
+        result = await self.fetch(link)
+        if result.get('success'):
+            self.cache.set(key, result)
+        return result
+
+    def _track(self, key: str, link: str):
+        now = time.time()
+        entry = self.popularity.get(key)
+        if entry is None:
+            if len(self.popularity) >= self.max_tracked:
+                self._prune(now)
+            self.popularity[key] = [1.0, now, link]
+        else:
+            entry[0] = entry[0] * math.exp(-self.decay * (now - entry[1])) + 1.0
+            entry[1] = now
+
+    def _score(self, entry: List, now: float) -> float:
+        return entry[0] * math.exp(-self.decay * (now - entry[1]))
+
+    def _prune(self, now: float):
+        # Drop the colder half so tracking stays bounded without pruning on every insert
+        keep = heapq.nlargest(self.max_tracked // 2, self.popularity.items(), key=lambda item: self._score(item[1], now))
+        self.popularity = dict(keep)
+
+    def popular(self, top_k: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """(key, link, decayed score) of the most requested links, hottest first"""
+        now = time.time()
+        ranked = heapq.nlargest(top_k or self.top_k, self.popularity.items(), key=lambda item: self._score(item[1], now))
+        return [(key, entry[2], self._score(entry, now)) for key, entry in ranked]
+
+    def _schedule(self, key: str, link: str) -> bool:
+        if key in self.refreshing:
+            return False
+        self.refreshing[key] = asyncio.create_task(self._refresh(key, link))
+        return True
+
+    async def _refresh(self, key: str, link: str):
+        try:
+            result = await self.fetch(link)
+            if result.get('success'):
+                self.cache.set(key, result)
+            else:
+                self.refresh_failures += 1
+        except Exception as e:
+            self.refresh_failures += 1
+            print(f"Error refreshing cached link: {e}")
+        finally:
+            self.refreshing.pop(key, None)
+
+    def refresh_popular(self) -> int:
+        """Start refreshes for top-K entries that expire within refresh_ahead seconds"""
+        started = 0
+        for key, link, _ in self.popular():
+            expires_in = self.cache.expires_in(key)
+            if expires_in is not None and expires_in < self.refresh_ahead and self._schedule(key, link):
+                started += 1
+        self.proactive_refreshes += started
+        return started
+
+    async def run(self, interval: float = 60.0, stats_file: Optional[str] = 'bypass_stats.json'):
+        """Background loop: proactive refresh every interval, popular links saved for the next warm-up"""
+        while True:
+            await asyncio.sleep(interval)
+            self.refresh_popular()
+            if stats_file:
+                await asyncio.to_thread(self.save_popular, stats_file)
+
+    def save_popular(self, stats_file: str = 'bypass_stats.json'):
+        popular = [{'link': link, 'score': round(score, 3)} for _, link, score in self.popular()]
+        update_json_key(stats_file, 'popular_links', popular, indent=2)
+
+    async def warm_up(self, stats_file: str = 'bypass_stats.json', top_k: Optional[int] = None, concurrency: int = 4) -> int:
+        """Re-bypass the most popular links from the last run that are not already cached"""
+        try:
+            with open(stats_file, 'r') as f:
+                popular = json.load(f).get('popular_links', [])
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            print(f"Error reading {stats_file}: {e}")
+            return 0
+
+        now = time.time()
+        links = []
+        for item in popular[:top_k or self.top_k]:
+            link = item['link']
+            key = self.key_fn(link)
+            # Seed popularity so the warmed entries are refreshed proactively from the start
+            self.popularity.setdefault(key, [item.get('score', 1.0), now, link])
+            expires_in = self.cache.expires_in(key)
+            if expires_in is None or expires_in < self.refresh_ahead:
+                links.append((key, link))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(key: str, link: str) -> bool:
+            async with semaphore:
+                try:
+                    result = await self.fetch(link)
+                except Exception as e:
+                    print(f"Error warming cached link: {e}")
+                    return False
+                if result.get('success'):
+                    self.cache.set(key, result)
+                    return True
+                return False
+
+        results = await asyncio.gather(*(warm(key, link) for key, link in links))
+        self.warmed += sum(results)
+        return sum(results)
+
+    def get_stats(self) -> Dict:
+        return {
+            'tracked_links': len(self.popularity),
+            'refreshing': len(self.refreshing),
+            'background_refreshes': self.background_refreshes,
+            'proactive_refreshes': self.proactive_refreshes,
+            'refresh_failures': self.refresh_failures,
+            'warmed': self.warmed
+        }
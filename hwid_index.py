@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+from blacklist_store import BlacklistStore
+from atomic_json import write_json
+
+def derive_hwid(user_id: int) -> str:
+    return hashlib.sha256(str(user_id).encode()).hexdigest()[:16].upper()
+
+class HWIDIndex:
+    """user_id <-> HWID index persisted as a snapshot plus an append-only log of new pairs.
+
+    Users seen for the first time are appended to ``<index_file>.log`` as they
+    are derived; the snapshot is only rewritten by flush() (and derive_many()),
+    never on the request path. Call flush() on shutdown.
+    """
+
+    def __init__(self, index_file='hwid_index.json', memo_size: int = 10000):
+        self.index_file = index_file
+        self.log_file = f"{index_file}.log"
+        self.memo_size = memo_size
+        # user_id -> hwid, least recently used first
+        self.memo = OrderedDict()
+        # hwid -> user_id, persisted
+        self.reverse = {}
+        # User ids blocked by user id or by HWID, kept current from the attached blacklists
+        self.blocked = set()
+        self.sources = []
+        self.log_entries = 0
+        self.load_data()
+
+    def load_data(self):
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r') as f:
+                    self.reverse = {hwid: int(user_id) for hwid, user_id in json.load(f).items()}
+        except Exception as e:
+            print(f"Error loading HWID index: {e}")
+
+        try:
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r') as f:
+                    for line in f:
+                        try:
+                            hwid, user_id = json.loads(line)
+                        except ValueError:
+                            # A torn last line from a crash mid-write
+                            continue
+                        self.reverse[hwid] = int(user_id)
+                        self.log_entries += 1
+        except Exception as e:
+            print(f"Error loading HWID index log: {e}")
+
+    def save_data(self):
+        """Rewrite the snapshot with every pair and drop the log"""
+        try:
+            write_json(self.index_file, self.reverse, separators=(',', ':'))
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+            self.log_entries = 0
+        except Exception as e:
+            print(f"Error saving HWID index: {e}")
+
+    def flush(self):
+        if self.log_entries:
+            self.save_data()
+
+    def _append(self, pairs: List):
+        try:
+            with open(self.log_file, 'a') as f:
+                f.write(''.join(json.dumps(pair, separators=(',', ':')) + '\n' for pair in pairs))
+            self.log_entries += len(pairs)
+        except Exception as e:
+            print(f"Error writing HWID index log: {e}")
+
+    def derive(self, user_id: int) -> str:
+        hwid = self.memo.get(user_id)
+        if hwid is not None:
+            self.memo.move_to_end(user_id)
+            return hwid
+
+        hwid = derive_hwid(user_id)
+        if self._remember(user_id, hwid):
+            self._append([[hwid, user_id]])
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return hwid
+
+    def _remember(self, user_id: int, hwid: str) -> bool:
+        """Memoise the pair; True if it was new to the reverse index"""
+        self.memo[user_id] = hwid
+        if self.reverse.get(hwid) == user_id:
+            return False
+        self.reverse[hwid] = user_id
+        if self._hwid_blacklisted(hwid):
+            self.blocked.add(user_id)
+        return True
+
+    def derive_many(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Backfill the reverse index for many users at once and save it once at the end"""
+        sha256 = hashlib.sha256
+        hwids = {user_id: sha256(str(user_id).encode()).hexdigest()[:16].upper() for user_id in user_ids}
+        added = [user_id for user_id, hwid in hwids.items() if self._remember(user_id, hwid)]
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        if added:
+            self.save_data()
+        return hwids
+
+    def user_for(self, hwid: str) -> Optional[int]:
+        return self.reverse.get(hwid)
+
+    def attach(self, store: BlacklistStore, user_lists: Iterable[str] = (), hwid_lists: Iterable[str] = ()):
+        source = (store, tuple(user_lists), tuple(hwid_lists))
+        self.sources.append(source)
+        for name in source[1]:
+            self.blocked.update(store.sets[name])
+        for name in source[2]:
+            self._block_hwids(store.sets[name])
+
+        def on_change(op: str, name: str, values: List):
+            if name in source[1]:
+                users = values
+            elif name in source[2]:
+                users = [self.reverse[hwid] for hwid in values if hwid in self.reverse]
+            else:
+                return
+            if op == '+':
+                self.blocked.update(users)
+            else:
+                # A user may still be blocked for another reason, so re-check each one
+                for user_id in users:
+                    self._recompute(user_id)
+
+        store.subscribe(on_change)
+
+    def _block_hwids(self, hwids: Iterable[str]):
+        for hwid in hwids:
+            user_id = self.reverse.get(hwid)
+            if user_id is not None:
+                self.blocked.add(user_id)
+
+    def _hwid_blacklisted(self, hwid: str) -> bool:
+        return any(hwid in store.sets[name] for store, _, hwid_lists in self.sources for name in hwid_lists)
+
+    def _recompute(self, user_id: int):
+        blocked = any(user_id in store.sets[name] for store, user_lists, _ in self.sources for name in user_lists)
+        if not blocked:
+            blocked = self._hwid_blacklisted(self.derive(user_id))
+        if blocked:
+            self.blocked.add(user_id)
+        else:
+            self.blocked.discard(user_id)
+
+    def is_user_blocked(self, user_id: int) -> bool:
+        # derive() is a memo hit for active users; it also indexes users seen for the first time
+        self.derive(user_id)
+        for store, _, _ in self.sources:
+            store.sync()
+        return user_id in self.blocked
+
+    def get_stats(self) -> Dict:
+        return {
+            'memo_entries': len(self.memo),
+            'indexed_hwids': len(self.reverse),
+            'log_entries': self.log_entries,
+            'blocked_users': len(self.blocked)
+        }
@@ -1,30 +1,47 @@
-import hashlib
-import json
-import os
+from typing import Dict, Iterable, Optional
+from blacklist_store import BlacklistStore
+from hwid_index import HWIDIndex
 
 class HWIDService:
-    def __init__(self, hwid_file='hwids.json'):
+    def __init__(self, hwid_file='hwids.json', index_file='hwid_index.json', activity=None):
         self.hwid_file = hwid_file
-        self.hwids = self.load_hwids()
+        self.store = BlacklistStore(hwid_file, ['blacklist'])
+        self.index = HWIDIndex(index_file)
+        self.index.attach(self.store, hwid_lists=['blacklist'])
+        # UserActivity keeps its own user and HWID blacklists; fold them into the same index
+        if activity is not None:
+            self.index.attach(activity.store, user_lists=['blacklisted_users'], hwid_lists=['blacklisted_hwids'])
     
     def load_hwids(self):
-        try:
-            if os.path.exists(self.hwid_file):
-                with open(self.hwid_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading HWIDs: {e}")
-        return {}
+        self.store.load_data()
     
     def save_hwids(self):
-        try:
-            with open(self.hwid_file, 'w') as f:
-                json.dump(self.hwids, f, indent=2)
-        except Exception as e:
-            print(f"Error saving HWIDs: {e}")
+        self.store.compact()
+        self.index.flush()
     
     def generate_hwid(self, user_id: int) -> str:
-        return hashlib.sha256(str(user_id).encode()).hexdigest()[:16].upper()
+        return self.index.derive(user_id)
+    
+    def generate_hwids(self, user_ids: Iterable[int]) -> Dict[int, str]:
+        return self.index.derive_many(user_ids)
+    
+    def get_user_id(self, hwid: str) -> Optional[int]:
+        return self.index.user_for(hwid)
     
     def is_blacklisted(self, hwid: str) -> bool:
-        return hwid in self.hwids.get('blacklist', [])
+        return self.store.contains('blacklist', hwid)
+    
+    def is_user_blocked(self, user_id: int) -> bool:
+        return self.index.is_user_blocked(user_id)
+    
+    def blacklist(self, hwid: str) -> bool:
+        return self.store.add('blacklist', hwid)
+    
+    def unblacklist(self, hwid: str) -> bool:
+        return self.store.remove('blacklist', hwid)
+    
+    def import_blacklist(self, hwids: Iterable[str]) -> int:
+        return self.store.bulk_add('blacklist', hwids)
+    
+    def export_blacklist(self):
+        return self.store.export('blacklist')
@@ -0,0 +1,128 @@
+import hashlib
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+MAX_LINK_LENGTH = 2048
+
+INVALID_LINK = 'Invalid link'
+UNSUPPORTED_LINK = 'Link not supported by any configured service'
+
+# Click ids that only identify where a link was shared from, dropped on every host. Generic
+# names such as "si" or "ref" can be real parameters, so those belong in per-shortener rules
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', '_gl'
+})
+TRACKING_PREFIXES = ('utm_',)
+
+# Destinations people paste into bypass channels that no provider can bypass
+UNSUPPORTED_HOSTS = frozenset({
+    'discord.com', 'discord.gg', 'discordapp.com', 'cdn.discordapp.com', 'media.discordapp.net',
+    'youtube.com', 'youtu.be', 'google.com', 'roblox.com', 'github.com', 'raw.githubusercontent.com',
+    'twitter.com', 'x.com', 'tenor.com', 'giphy.com', 'reddit.com', 'tiktok.com', 'instagram.com'
+})
+
+class ShortenerRule:
+    __slots__ = ('host', 'drop_params', 'path_rewrites')
+
+    def __init__(self, host: Optional[str] = None, drop_params: Iterable[str] = (), path_rewrites: Iterable[Tuple[str, str]] = ()):
+        # Mirror domains are folded onto one canonical host
+        self.host = host
+        self.drop_params = frozenset(drop_params)
+        self.path_rewrites = tuple((re.compile(pattern), replacement) for pattern, replacement in path_rewrites)
+
+_LINKVERTISE = ShortenerRule(host='linkvertise.com', drop_params=('o',))
+
+# Known shorteners are always fetched over https; keys are hosts without "www."
+SHORTENER_RULES = {
+    'linkvertise.com': _LINKVERTISE,
+    'link-to.net': _LINKVERTISE,
+    'up-to-down.net': _LINKVERTISE,
+    'direct-link.net': _LINKVERTISE,
+    'link-center.net': _LINKVERTISE,
+    'link-hub.net': _LINKVERTISE,
+    'link-target.net': _LINKVERTISE,
+    'file-link.net': _LINKVERTISE,
+    'pastebin.com': ShortenerRule(path_rewrites=[(r'^/raw/(\w+)$', r'/\1')]),
+    'work.ink': ShortenerRule(),
+    'loot-link.com': ShortenerRule(),
+    'lootdest.org': ShortenerRule(),
+    'admaven.com': ShortenerRule(),
+    'cuty.io': ShortenerRule(),
+    'ouo.io': ShortenerRule(),
+    'lockr.so': ShortenerRule(),
+    'rekonise.com': ShortenerRule(),
+    'mboost.me': ShortenerRule(),
+    'sub2unlock.com': ShortenerRule(),
+    'sub4unlock.com': ShortenerRule(),
+    'pastefy.app': ShortenerRule(),
+    'paste-drop.com': ShortenerRule(),
+    'link-unlock.com': ShortenerRule(),
+    'linkify.ru': ShortenerRule()
+}
+
+def _is_tracking(name: str) -> bool:
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+@lru_cache(maxsize=10000)
+def check_link(link: str) -> Tuple[Optional[str], Optional[str]]:
+    """Return (canonical link, None), or (None, error) for links that should not reach a provider.
+
+    The canonical link identifies the target for cache keys and coalescing;
+    it is not what gets sent to providers.
+    """
+    link = link.strip()
+    if not link or len(link) > MAX_LINK_LENGTH or any(char.isspace() for char in link):
+        return None, INVALID_LINK
+    if '://' not in link:
+        # Pasted without a scheme, e.g. "linkvertise.com/123/name"
+        link = f'https://{link}'
+    try:
+        parts = urlsplit(link)
+        port = parts.port
+    except ValueError:
+        return None, INVALID_LINK
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    if scheme not in ('http', 'https') or '.' not in host or parts.username is not None:
+        return None, INVALID_LINK
+    if host.startswith('www.'):
+        host = host[4:]
+    if host in UNSUPPORTED_HOSTS:
+        return None, UNSUPPORTED_LINK
+
+    default_port = 443 if scheme == 'https' else 80
+
+    # Paths stay case-sensitive (shortener ids are), only the trailing slash goes
+    path = parts.path.rstrip('/')
+    drop_params = ()
+    rule = SHORTENER_RULES.get(host)
+    if rule is not None:
+        scheme = 'https'
+        host = rule.host or host
+        drop_params = rule.drop_params
+        for pattern, replacement in rule.path_rewrites:
+            path = pattern.sub(replacement, path)
+    if port is not None and port != default_port:
+        # Non-default ports stay part of the host; default ones are dropped
+        host = f'{host}:{port}'
+    query = '&'.join(
+        pair for pair in parts.query.split('&')
+        if pair and not _is_tracking(pair.split('=', 1)[0]) and pair.split('=', 1)[0] not in drop_params
+    )
+    return urlunsplit((scheme, host, path, query, '')), None
+
+def cache_key(link: str) -> str:
+    """Stable hashed key shared by the cache, request coalescing and stats"""
+    canonical = check_link(link)[0] or link.strip()
+    return hashlib.blake2b(canonical.encode(), digest_size=12).hexdigest()
+
+def get_stats() -> Dict:
+    info = check_link.cache_info()
+    return {
+        'memo_entries': info.currsize,
+        'memo_hits': info.hits,
+        'memo_misses': info.misses
+    }
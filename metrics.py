@@ -0,0 +1,272 @@
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Tuple
+from atomic_json import update_json_key
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in self.values.items():
+            yield self.name, _label_text(self.labels, label_values), value
+
+    def snapshot(self):
+        return {','.join(map(str, key)) or 'total': value for key, value in self.values.items()}
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text, labels)
+        # A gauge with fn is read at collection time instead of being updated on the hot path
+        self.fn = fn
+
+    def set(self, *label_values, value: float):
+        self.values[label_values] = value
+
+    def dec(self, *label_values, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self):
+        if self.fn is not None:
+            yield self.name, '', self.fn()
+        else:
+            yield from super().samples()
+
+    def snapshot(self):
+        if self.fn is not None:
+            return self.fn()
+        return super().snapshot()
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, value: float, *label_values):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        for label_values, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket', _label_text(self.labels, label_values, f'le="{le}"'), cumulative
+            yield f'{self.name}_sum', _label_text(self.labels, label_values), series[-1]
+            yield f'{self.name}_count', _label_text(self.labels, label_values), cumulative
+
+    def quantile(self, q: float, *label_values) -> Optional[float]:
+        series = self.values.get(label_values)
+        if not series:
+            return None
+        total = sum(series[:-1])
+        target = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        result = {}
+        for label_values, series in self.values.items():
+            count = sum(series[:-1])
+            result[','.join(map(str, label_values)) or 'total'] = {
+                'count': count,
+                'avg': round(series[-1] / count, 4) if count else 0.0,
+                'p50': self.quantile(0.5, *label_values),
+                'p95': self.quantile(0.95, *label_values),
+                'p99': self.quantile(0.99, *label_values)
+            }
+        return result
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.metrics.get(name) or self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = (), fn: Optional[Callable[[], float]] = None) -> Gauge:
+        gauge = self.metrics.get(name)
+        if gauge is None:
+            gauge = self.register(Gauge(name, help_text, labels, fn))
+        elif fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.get(name) or self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+REGISTRY = Registry()
+
+def _claim(instance) -> bool:
+    # Each instance is wrapped once; wrapping again would record every call twice
+    if getattr(instance, '_instrumented', False):
+        return False
+    instance._instrumented = True
+    return True
+
+def instrument(provider=None, cache=None, rate_limiter=None, user_rate_limiter=None, registry: Registry = REGISTRY):
+    """Wrap the hot-path methods of the given instances so they record into registry; safe to call again"""
+    if provider is not None and _claim(provider):
+        bypass_latency = registry.histogram('bypass_duration_seconds', 'End-to-end BypassProvider.bypass latency', ('outcome',))
+        bypass_total = registry.counter('bypass_requests_total', 'BypassProvider.bypass calls', ('outcome', 'api_name'))
+        in_flight = registry.gauge('bypass_in_flight', 'bypass calls currently running')
+        hop_latency = registry.histogram('provider_request_duration_seconds', 'Latency of a single provider request', ('provider', 'outcome'))
+
+        bypass = provider.bypass
+
+        @functools.wraps(bypass)
+        async def timed_bypass(*args, **kwargs):
+            started = time.perf_counter()
+            in_flight.inc()
+            try:
+                result = await bypass(*args, **kwargs)
+            finally:
+                in_flight.dec()
+            outcome = 'success' if result['success'] else 'failure'
+            bypass_latency.observe(time.perf_counter() - started, outcome)
+            bypass_total.inc(outcome, result.get('api_name', 'unknown'))
+            return result
+
+        provider.bypass = timed_bypass
+
+        def timed_hop(method):
+            @functools.wraps(method)
+            async def wrapper(api_url, session, timeout, api_name, *args, **kwargs):
+                started = time.perf_counter()
+                result = await method(api_url, session, timeout, api_name, *args, **kwargs)
+                if result['success']:
+                    outcome = 'success'
+                elif result.get('unsupported'):
+                    outcome = 'unsupported'
+                else:
+                    outcome = 'failure'
+                # Label by provider key (e.g. "zen-bypass"); the display name is only a fallback
+                hop_latency.observe(time.perf_counter() - started, kwargs.get('provider') or api_name, outcome)
+                return result
+            return wrapper
+
+        provider._try_api_get = timed_hop(provider._try_api_get)
+        provider._try_api_post = timed_hop(provider._try_api_post)
+
+    if cache is not None and _claim(cache):
+        cache_ops = registry.counter('cache_operations_total', 'CacheManager get/set calls', ('op', 'result'))
+        cache_latency = registry.histogram('cache_operation_duration_seconds', 'CacheManager get/set latency', ('op',),
+                                           buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01))
+        registry.gauge('cache_entries', 'Entries held in CacheManager', fn=lambda: len(cache.cache))
+        registry.gauge('cache_bytes', 'Approximate bytes held in CacheManager', fn=lambda: cache.total_bytes)
+
+        get, set_ = cache.get, cache.set
+
+        @functools.wraps(get)
+        def timed_get(key):
+            started = time.perf_counter()
+            value = get(key)
+            cache_latency.observe(time.perf_counter() - started, 'get')
+            cache_ops.inc('get', 'hit' if value is not None else 'miss')
+            return value
+
+        @functools.wraps(set_)
+        def timed_set(key, value):
+            started = time.perf_counter()
+            set_(key, value)
+            cache_latency.observe(time.perf_counter() - started, 'set')
+            cache_ops.inc('set', 'ok')
+
+        cache.get, cache.set = timed_get, timed_set
+
+    limiter_decisions = registry.counter('rate_limit_decisions_total', 'Rate limiter decisions', ('limiter', 'result'))
+
+    if rate_limiter is not None and _claim(rate_limiter):
+        is_allowed = rate_limiter.is_allowed
+
+        @functools.wraps(is_allowed)
+        def counted_is_allowed(identifier):
+            allowed = is_allowed(identifier)
+            limiter_decisions.inc('rate_limiter', 'allowed' if allowed else 'denied')
+            return allowed
+
+        rate_limiter.is_allowed = counted_is_allowed
+
+    if user_rate_limiter is not None and _claim(user_rate_limiter):
+        def counted(method):
+            @functools.wraps(method)
+            def wrapper(user_id):
+                result = method(user_id)
+                limiter_decisions.inc('user_rate_limiter', 'allowed' if result['allowed'] else result['limit_type'])
+                return result
+            return wrapper
+
+        user_rate_limiter.check_rate_limit = counted(user_rate_limiter.check_rate_limit)
+        user_rate_limiter.acquire = counted(user_rate_limiter.acquire)
+
+async def start_http_server(port: int = 9108, host: str = '127.0.0.1', registry: Registry = REGISTRY):
+    """Serve registry.render() at http://host:port/metrics; returns the runner to clean up"""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+async def snapshot_loop(stats_file: str = 'bypass_stats.json', interval: float = 60.0, registry: Registry = REGISTRY):
+    """Periodically merge a metrics summary into stats_file under 'metrics'"""
+    while True:
+        await asyncio.sleep(interval)
+        # Build the snapshot on the loop (cheap), do the file I/O off it
+        await asyncio.to_thread(update_json_key, stats_file, 'metrics', registry.snapshot(), indent=2)
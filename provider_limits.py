@@ -0,0 +1,94 @@
+import asyncio
+import time
+from typing import Dict, Optional
+from rate_limit_engine import RateLimitEngine, Rule
+
+class ProviderLimiter:
+    """Outbound limits for one provider; with no concurrency or rps set only Retry-After back-off applies"""
+
+    def __init__(self, concurrency: Optional[int] = None, rps: Optional[float] = None, max_wait: float = 2.0):
+        self.concurrency = concurrency
+        self.rps = rps
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+        # Request budget as a GCRA rule; allowing rps requests per second in a burst
+        self.budget = RateLimitEngine([Rule('rps', max(1, int(rps)), max(1, int(rps)) / rps)]) if rps else None
+        self.blocked_until = 0.0
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    async def acquire(self) -> bool:
+        """Wait up to max_wait for a slot and a request token; False means skip this provider"""
+        started = time.monotonic()
+        deadline = started + self.max_wait
+
+        blocked_for = self.blocked_until - time.time()
+        if blocked_for > 0:
+            if blocked_for > self.max_wait:
+                self.rejected += 1
+                return False
+            await asyncio.sleep(blocked_for)
+
+        if self.semaphore is not None:
+            self.waiting += 1
+            try:
+                if self.semaphore.locked():
+                    await asyncio.wait_for(self.semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+                else:
+                    await self.semaphore.acquire()
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+
+        try:
+            while self.budget:
+                result = self.budget.consume('rps')
+                if result['allowed']:
+                    break
+                if time.monotonic() + result['retry_after'] > deadline:
+                    self._release_slot()
+                    self.rejected += 1
+                    return False
+                await asyncio.sleep(result['retry_after'])
+        except asyncio.CancelledError:
+            self._release_slot()
+            raise
+
+        waited = time.monotonic() - started
+        self.in_flight += 1
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._release_slot()
+
+    def _release_slot(self):
+        if self.semaphore is not None:
+            self.semaphore.release()
+
+    def block_for(self, seconds: float):
+        # Honour an upstream Retry-After by refusing to call until it passes
+        self.blocked_until = max(self.blocked_until, time.time() + seconds)
+
+    def get_stats(self) -> Dict:
+        return {
+            'concurrency': self.concurrency,
+            'rps': self.rps,
+            'in_flight': self.in_flight,
+            'queue_depth': self.waiting,
+            'acquired': self.acquired,
+            'rejected': self.rejected,
+            'avg_wait': round(self.total_wait / self.acquired, 4) if self.acquired else 0.0,
+            'max_wait': round(self.max_wait_seen, 4),
+            'blocked_for': round(max(0.0, self.blocked_until - time.time()), 1)
+        }
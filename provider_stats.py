@@ -0,0 +1,116 @@
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional
+from atomic_json import write_json
+
+class ProviderStats:
+    def __init__(self, stats_file='provider_stats.json', window: int = 100, alpha: float = 0.2, save_interval: int = 60):
+        self.stats_file = stats_file
+        self.window = window
+        self.alpha = alpha
+        self.save_interval = save_interval
+        self.providers = {}
+        self.last_save = time.time()
+        self.dirty = False
+        self.load_data()
+
+    def _entry(self, provider: str) -> Dict:
+        if provider not in self.providers:
+            self.providers[provider] = {
+                'ewma_latency': None,
+                # 's' = success, 'f' = failure, 'u' = link unsupported
+                'outcomes': deque(maxlen=self.window),
+                'latencies': deque(maxlen=self.window)
+            }
+        return self.providers[provider]
+
+    def load_data(self):
+        try:
+            if os.path.exists(self.stats_file):
+                with open(self.stats_file, 'r') as f:
+                    data = json.load(f)
+                for provider, saved in data.items():
+                    entry = self._entry(provider)
+                    entry['ewma_latency'] = saved.get('ewma_latency')
+                    entry['outcomes'].extend(saved.get('outcomes', ''))
+                    entry['latencies'].extend(saved.get('latencies', []))
+        except Exception as e:
+            print(f"Error loading provider stats: {e}")
+
+    def save_data(self):
+        data = {
+            provider: {
+                'ewma_latency': entry['ewma_latency'],
+                'outcomes': ''.join(entry['outcomes']),
+                'latencies': [round(latency, 4) for latency in entry['latencies']]
+            }
+            for provider, entry in self.providers.items()
+        }
+        try:
+            write_json(self.stats_file, data)
+            self.dirty = False
+            self.last_save = time.time()
+        except Exception as e:
+            print(f"Error saving provider stats: {e}")
+
+    def record(self, provider: str, success: bool, latency: float, unsupported: bool = False):
+        entry = self._entry(provider)
+        if entry['ewma_latency'] is None:
+            entry['ewma_latency'] = latency
+        else:
+            entry['ewma_latency'] = self.alpha * latency + (1 - self.alpha) * entry['ewma_latency']
+
+        if success:
+            entry['outcomes'].append('s')
+            entry['latencies'].append(latency)
+        else:
+            entry['outcomes'].append('u' if unsupported else 'f')
+
+        self.dirty = True
+        if time.time() - self.last_save >= self.save_interval:
+            self.save_data()
+
+    def flush(self):
+        if self.dirty:
+            self.save_data()
+
+    def success_rate(self, provider: str) -> float:
+        outcomes = self._entry(provider)['outcomes']
+        # Laplace smoothing keeps a cold provider at 0.5 instead of 0 or 1
+        return (outcomes.count('s') + 1) / (len(outcomes) + 2)
+
+    def unsupported_rate(self, provider: str) -> float:
+        outcomes = self._entry(provider)['outcomes']
+        if not outcomes:
+            return 0.0
+        return outcomes.count('u') / len(outcomes)
+
+    def latency_percentile(self, provider: str, percentile: float, min_samples: int = 5) -> Optional[float]:
+        samples = self._entry(provider)['latencies']
+        if len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percentile))
+        return ordered[index]
+
+    def score(self, provider: str, default_latency: float) -> float:
+        # Expected time spent on this provider per successful bypass; lower is better
+        latency = self._entry(provider)['ewma_latency']
+        if latency is None:
+            latency = default_latency
+        return latency / self.success_rate(provider)
+
+    def rank(self, providers: List[str], default_latency: float) -> List[str]:
+        # sorted() is stable, so providers without history keep the static order
+        return sorted(providers, key=lambda provider: self.score(provider, default_latency))
+
+    def get_stats(self, provider: str) -> Dict:
+        entry = self._entry(provider)
+        return {
+            'samples': len(entry['outcomes']),
+            'success_rate': round(self.success_rate(provider), 4),
+            'unsupported_rate': round(self.unsupported_rate(provider), 4),
+            'ewma_latency': round(entry['ewma_latency'], 4) if entry['ewma_latency'] is not None else None
+        }
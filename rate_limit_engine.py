@@ -0,0 +1,181 @@
+import math
+import time
+from typing import Dict, Hashable, List, Optional
+from shared_state import SharedState
+
+EPSILON = 1e-9
+
+# Returned when a shared backend can't be reached in time: deny, and let the caller retry shortly
+UNAVAILABLE = {
+    'allowed': False,
+    'limit_type': 'unavailable',
+    'retry_after': 1.0
+}
+
+class Rule:
+    """limit units per period, refilled one every period / limit seconds.
+
+    burst is how many units can be taken at once (default limit). A sliding
+    rule with burst == limit lets up to 2 * limit - 1 through in one period;
+    any window of length period sees at most burst + limit - 1.
+    """
+    __slots__ = ('name', 'limit', 'period', 'fixed_window', 'interval', 'burst', 'tolerance')
+
+    def __init__(self, name: str, limit: int, period: float, fixed_window: bool = False, burst: Optional[int] = None):
+        self.name = name
+        self.limit = limit
+        self.period = period
+        # Fixed windows are aligned to the epoch, so a 86400s window resets at midnight UTC
+        self.fixed_window = fixed_window
+        self.interval = period / limit
+        self.burst = limit if fixed_window or burst is None else burst
+        # How far a TAT may run ahead of now
+        self.tolerance = self.burst * self.interval
+
+    def base(self, now: float) -> float:
+        return now - now % self.period if self.fixed_window else now
+
+class RateLimitEngine:
+    """GCRA rate limiting with any number of stacked rules per key.
+
+    Each key holds one float per rule: its theoretical arrival time (TAT).
+    A key whose TATs are all in the past is indistinguishable from a new
+    key, so idle keys are evicted without losing any limit information.
+    Every method is synchronous, which makes check-and-consume atomic with
+    respect to other coroutines on the event loop. With a shared backend the
+    TATs live there instead and each consume is one atomic update, so limits
+    stay exact across processes.
+    """
+
+    def __init__(self, rules: List[Rule], sweep_interval: float = 60.0,
+                 shared: Optional[SharedState] = None, namespace: str = 'rate'):
+        self.rules = list(rules)
+        self.state = {}
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.time()
+        self.shared = shared
+        self.namespace = namespace
+        # A key untouched for this long is idle under every rule, so the backend may drop it
+        self.shared_ttl = 2 * max(rule.period for rule in self.rules)
+
+    def get_state(self, key: Hashable) -> Optional[List[float]]:
+        if self.shared is not None:
+            return self.shared.get(self.namespace, str(key))
+        return self.state.get(key)
+
+    def _evaluate(self, tats: Optional[List[float]], now: float):
+        # Returns the TATs after consuming one unit, or the first rule that denies the request
+        new_tats = []
+        for index, rule in enumerate(self.rules):
+            period = rule.period
+            base = now - now % period if rule.fixed_window else now
+            tat = tats[index] if tats else 0.0
+            new_tat = (tat if tat > base else base) + rule.interval
+            if new_tat > base + rule.tolerance + EPSILON:
+                if rule.fixed_window:
+                    retry_after = base + period - now
+                else:
+                    retry_after = new_tat - rule.tolerance - now
+                return None, rule, max(0.0, retry_after)
+            new_tats.append(new_tat)
+        return new_tats, None, 0.0
+
+    def _remaining(self, tats: List[float], now: float, extra: int = 0) -> Dict[str, int]:
+        remaining = {}
+        for tat, rule in zip(tats, self.rules):
+            base = now - now % rule.period if rule.fixed_window else now
+            used = (tat - base) / rule.interval if tat > base else 0.0
+            remaining[rule.name] = max(0, rule.burst - math.ceil(used - EPSILON) + extra)
+        return remaining
+
+    def check(self, key: Hashable, now: Optional[float] = None) -> Dict:
+        now = time.time() if now is None else now
+        if self.shared is not None:
+            # Read inside update() so an unreachable backend fails closed here too, as it does in consume()
+            return self.shared.update(self.namespace, str(key), lambda tats: (None, self._check(tats, now)),
+                                      default=dict(UNAVAILABLE))
+        return self._check(self.state.get(key), now)
+
+    def _check(self, tats: Optional[List[float]], now: float) -> Dict:
+        new_tats, denied, retry_after = self._evaluate(tats, now)
+        if denied is not None:
+            return {
+                'allowed': False,
+                'limit_type': denied.name,
+                'retry_after': retry_after
+            }
+        # Nothing was consumed, so one more unit is still available per rule
+        return {
+            'allowed': True,
+            'remaining': self._remaining(new_tats, now, extra=1)
+        }
+
+    def consume(self, key: Hashable, now: Optional[float] = None, force: bool = False) -> Dict:
+        """Check every rule and, only if all pass (or force is set), consume one unit from each"""
+        now = time.time() if now is None else now
+        if self.shared is not None:
+            return self.shared.update(self.namespace, str(key), lambda tats: self._consume(tats, now, force), self.shared_ttl,
+                                      default=dict(UNAVAILABLE))
+        if now - self.last_sweep >= self.sweep_interval:
+            self.evict_idle(now)
+        new_tats, result = self._consume(self.state.get(key), now, force)
+        if new_tats is not None:
+            self.state[key] = new_tats
+        return result
+
+    def _consume(self, tats: Optional[List[float]], now: float, force: bool):
+        new_tats, denied, retry_after = self._evaluate(tats, now)
+        if new_tats is None:
+            if not force:
+                return None, {
+                    'allowed': False,
+                    'limit_type': denied.name,
+                    'retry_after': retry_after
+                }
+            new_tats = [
+                max(tats[index] if tats else 0.0, rule.base(now)) + rule.interval
+                for index, rule in enumerate(self.rules)
+            ]
+        return new_tats, {
+            'allowed': True,
+            'remaining': self._remaining(new_tats, now)
+        }
+
+    def refund(self, key: Hashable, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        if self.shared is not None:
+            self.shared.update(self.namespace, str(key), lambda tats: (self._refunded(tats, now), None), self.shared_ttl)
+            return
+        tats = self.state.get(key)
+        if tats:
+            self.state[key] = self._refunded(tats, now)
+
+    def _refunded(self, tats: Optional[List[float]], now: float) -> Optional[List[float]]:
+        if not tats:
+            return None
+        return [max(rule.base(now), tat - rule.interval) for tat, rule in zip(tats, self.rules)]
+
+    def remaining(self, key: Hashable, index: int, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        tats = self.get_state(key)
+        if not tats:
+            return self.rules[index].burst
+        return self._remaining(tats, now)[self.rules[index].name]
+
+    def window_reset(self, index: int, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        rule = self.rules[index]
+        return rule.base(now) + rule.period if rule.fixed_window else now + rule.period
+
+    def is_idle(self, key: Hashable, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        tats = self.get_state(key)
+        return not tats or all(tat <= rule.base(now) for tat, rule in zip(tats, self.rules))
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        idle = [key for key in self.state if self.is_idle(key, now)]
+        for key in idle:
+            del self.state[key]
+        self.last_sweep = now
+        return len(idle)
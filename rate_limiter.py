@@ -1,34 +1,30 @@
-import time
-from collections import defaultdict, deque
+from typing import Optional
+from rate_limit_engine import RateLimitEngine, Rule
+from shared_state import SharedState
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 10, time_window: int = 60):
+    """At most max_requests per time_window for each identifier, in any window.
+
+    GCRA can't give a full max_requests burst and a max_requests refill per
+    window without letting nearly twice that through one window, so the
+    limit is split: up to burst at once (about half by default), then the
+    rest refilled evenly, with burst + refill - 1 == max_requests.
+    """
+
+    def __init__(self, max_requests: int = 10, time_window: int = 60, shared: Optional[SharedState] = None, namespace: str = 'rate_limiter',
+                 burst: Optional[int] = None):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = defaultdict(deque)
+        self.burst = min(max_requests, burst or (max_requests + 1) // 2)
+        rule = Rule('requests', max_requests - self.burst + 1, time_window, burst=self.burst)
+        self.engine = RateLimitEngine([rule], shared=shared, namespace=namespace)
     
     def is_allowed(self, identifier: str) -> bool:
-        current_time = time.time()
-        user_requests = self.requests[identifier]
-        
-        while user_requests and current_time - user_requests[0] > self.time_window:
-            user_requests.popleft()
-        
-        if len(user_requests) < self.max_requests:
-            user_requests.append(current_time)
-            return True
-        
-        return False
+        return self.engine.consume(identifier)['allowed']
     
     def get_retry_after(self, identifier: str) -> int:
-        if not self.requests[identifier]:
+        result = self.engine.check(identifier)
+        if result['allowed']:
             return 0
         
-        oldest_request = self.requests[identifier][0]
-        current_time = time.time()
-        elapsed = current_time - oldest_request
-        
-        if elapsed < self.time_window:
-            return int(self.time_window - elapsed)
-        
-        return 0
+        return int(result['retry_after'])
@@ -0,0 +1,89 @@
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable
+from atomic_json import write_json
+
+class RateStore(ABC):
+    """Persistence backend for UserRateLimiter; user records are plain dicts"""
+    # Whether save() needs every record rather than just the dirty ones
+    full_rewrite = False
+
+    @abstractmethod
+    def load_all(self) -> Dict[int, Dict]:
+        ...
+
+    @abstractmethod
+    def save(self, user_data: Dict[int, Dict], dirty: Iterable[int]):
+        ...
+
+    def close(self):
+        pass
+
+
+class JSONRateStore(RateStore):
+    full_rewrite = True
+
+    def __init__(self, rate_file='user_rates.json'):
+        self.rate_file = rate_file
+
+    def load_all(self) -> Dict[int, Dict]:
+        try:
+            if os.path.exists(self.rate_file):
+                with open(self.rate_file, 'r') as f:
+                    data = json.load(f)
+                    return {int(k): v for k, v in data.items()}
+        except Exception as e:
+            print(f"Error loading rate limit data: {e}")
+        return {}
+
+    def save(self, user_data: Dict[int, Dict], dirty: Iterable[int]):
+        # JSON can't be updated in place, so rewrite it whole but atomically
+        try:
+            write_json(self.rate_file, {str(k): v for k, v in user_data.items()}, fsync=True, separators=(',', ':'))
+        except Exception as e:
+            print(f"Error saving rate limit data: {e}")
+
+
+class SQLiteRateStore(RateStore):
+    def __init__(self, db_file='user_rates.db', migrate_from: str = 'user_rates.json'):
+        self.db_file = db_file
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS user_rates (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+        self.db.commit()
+        if migrate_from:
+            self.migrate(migrate_from)
+
+    def migrate(self, json_file: str):
+        if not os.path.exists(json_file):
+            return
+        if self.db.execute('SELECT 1 FROM user_rates LIMIT 1').fetchone():
+            return
+        user_data = JSONRateStore(json_file).load_all()
+        self.save(user_data, user_data.keys())
+        # Keep the old file around, but out of the way so it isn't imported twice
+        os.replace(json_file, f"{json_file}.migrated")
+        print(f"Migrated {len(user_data)} users from {json_file} to {self.db_file}")
+
+    def load_all(self) -> Dict[int, Dict]:
+        try:
+            return {user_id: json.loads(data) for user_id, data in self.db.execute('SELECT user_id, data FROM user_rates')}
+        except Exception as e:
+            print(f"Error loading rate limit data: {e}")
+        return {}
+
+    def save(self, user_data: Dict[int, Dict], dirty: Iterable[int]):
+        rows = [(user_id, json.dumps(user_data[user_id], separators=(',', ':'))) for user_id in dirty if user_id in user_data]
+        if not rows:
+            return
+        try:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO user_rates (user_id, data) VALUES (?, ?)', rows)
+        except Exception as e:
+            print(f"Error saving rate limit data: {e}")
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,134 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from atomic_json import write_json
+
+class RoutingIndex:
+    def __init__(self, index_file='routing_index.json', half_life: float = 86400, expiry: float = 7 * 86400, save_interval: int = 60,
+                 min_rejections: float = 3.0, probe_interval: float = 600.0):
+        self.index_file = index_file
+        self.half_life = half_life
+        # A provider is skipped for a pattern only after this many (decayed) "unsupported" replies
+        self.min_rejections = min_rejections
+        # A skipped provider still gets one probe request this often, so the block can clear
+        self.probe_interval = probe_interval
+        # (pattern, provider) -> time of the last probe let through
+        self.probes = {}
+        self.expiry = expiry
+        self.save_interval = save_interval
+        # pattern -> provider -> [success weight, unsupported weight, last update]
+        self.routes = {}
+        self.last_save = time.time()
+        self.dirty = False
+        self.load_data()
+
+    def load_data(self):
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r') as f:
+                    self.routes = json.load(f)
+                self.prune()
+        except Exception as e:
+            print(f"Error loading routing index: {e}")
+
+    def save_data(self):
+        try:
+            write_json(self.index_file, self.routes, separators=(',', ':'))
+            self.dirty = False
+            self.last_save = time.time()
+        except Exception as e:
+            print(f"Error saving routing index: {e}")
+
+    def flush(self):
+        if self.dirty:
+            self.save_data()
+
+    def pattern_for(self, link: str) -> Optional[str]:
+        try:
+            parts = urlsplit(link if '://' in link else f'http://{link}')
+        except ValueError:
+            return None
+        host = (parts.hostname or '').lower()
+        if not host:
+            return None
+        if host.startswith('www.'):
+            host = host[4:]
+
+        # Keep a leading path segment only when it looks like a fixed route
+        # ("pastebin.com/raw") rather than a per-link id or slug
+        segments = [segment for segment in parts.path.split('/') if segment]
+        if segments and segments[0].isalpha() and len(segments[0]) <= 12:
+            return f'{host}/{segments[0].lower()}'
+        return host
+
+    def _decayed(self, entry: List, now: float) -> List[float]:
+        factor = 0.5 ** ((now - entry[2]) / self.half_life)
+        return [entry[0] * factor, entry[1] * factor]
+
+    def record(self, pattern: str, provider: str, success: bool, unsupported: bool):
+        if not success and not unsupported:
+            # Timeouts and generic errors say nothing about what the provider supports
+            return
+        now = time.time()
+        providers = self.routes.setdefault(pattern, {})
+        entry = providers.get(provider)
+        ok, rejected = self._decayed(entry, now) if entry else [0.0, 0.0]
+        if success:
+            ok += 1
+        else:
+            rejected += 1
+        providers[provider] = [round(ok, 3), round(rejected, 3), int(now)]
+
+        self.dirty = True
+        if now - self.last_save >= self.save_interval:
+            self.prune()
+            self.save_data()
+
+    def _lookup(self, pattern: str, provider: str) -> Optional[List]:
+        entry = self.routes.get(pattern, {}).get(provider)
+        if entry is None and '/' in pattern:
+            # Fall back to what we know about the shortener host as a whole
+            entry = self.routes.get(pattern.split('/', 1)[0], {}).get(provider)
+        return entry
+
+    def is_rejected(self, pattern: str, provider: str) -> bool:
+        entry = self._lookup(pattern, provider)
+        if not entry:
+            return False
+        now = time.time()
+        ok, rejected = self._decayed(entry, now)
+        if rejected < self.min_rejections or rejected <= ok:
+            return False
+        # Let one request through per probe_interval; its outcome updates the entry
+        last_probe = self.probes.get((pattern, provider), 0.0)
+        if now - max(entry[2], last_probe) >= self.probe_interval:
+            self.probes[(pattern, provider)] = now
+            return False
+        return True
+
+    def has_succeeded(self, pattern: str, provider: str) -> bool:
+        entry = self._lookup(pattern, provider)
+        if not entry:
+            return False
+        ok, rejected = self._decayed(entry, time.time())
+        return ok >= 0.5 and ok > rejected
+
+    def prune(self):
+        cutoff = time.time() - self.expiry
+        for pattern in list(self.routes):
+            providers = self.routes[pattern]
+            for provider in [p for p, entry in providers.items() if entry[2] < cutoff]:
+                del providers[provider]
+                self.dirty = True
+            if not providers:
+                del self.routes[pattern]
+
+    def get_routes(self, pattern: str) -> Dict:
+        now = time.time()
+        routes = {}
+        for provider, entry in self.routes.get(pattern, {}).items():
+            ok, rejected = self._decayed(entry, now)
+            routes[provider] = {'success': round(ok, 2), 'unsupported': round(rejected, 2)}
+        return routes
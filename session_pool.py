@@ -0,0 +1,94 @@
+import asyncio
+import aiohttp
+from typing import Dict, Iterable
+
+class SessionPool:
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, dns_ttl: int = 300, keepalive_timeout: float = 60.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.session = None
+        self.timeouts = {}
+
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_hits = 0
+        self.dns_misses = 0
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the connector binds to the running event loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+        return self.session
+
+    def timeout(self, total: float) -> aiohttp.ClientTimeout:
+        client_timeout = self.timeouts.get(total)
+        if client_timeout is None:
+            client_timeout = aiohttp.ClientTimeout(total=total)
+            # Deadline-trimmed hop timeouts are all different; only keep the common ones
+            if len(self.timeouts) < 32:
+                self.timeouts[total] = client_timeout
+        return client_timeout
+
+    async def prewarm(self, origins: Iterable[str], timeout: float = 5.0):
+        """Open a keep-alive connection to each origin so the first real request skips DNS and TLS"""
+        session = self.get_session()
+
+        async def touch(origin: str):
+            try:
+                async with session.head(origin, timeout=self.timeout(timeout), allow_redirects=False) as response:
+                    await response.release()
+            except Exception as e:
+                print(f"Error pre-warming {origin}: {e}")
+
+        await asyncio.gather(*(touch(origin) for origin in origins))
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def get_stats(self) -> Dict:
+        connections = self.connections_created + self.connections_reused
+        return {
+            'requests': self.requests,
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'reuse_rate': round(self.connections_reused / connections, 4) if connections else 0.0,
+            'dns_cache_hits': self.dns_hits,
+            'dns_cache_misses': self.dns_misses,
+            'open': self.session is not None and not self.session.closed
+        }
@@ -0,0 +1,215 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List, Optional, Tuple
+
+class SharedState(ABC):
+    """Key/value state shared by every shard or worker that uses the same backend.
+
+    Keys are strings grouped into namespaces; values are JSON-serialisable.
+    update() is the primitive that makes limits exact across processes: it
+    runs fn(current) -> (new_value, result) atomically and returns result,
+    or default if the backend could not run it.
+    A ttl makes an entry read back as missing once it has expired.
+    durable is True when the state survives a restart of every process using it.
+    """
+
+    durable = False
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Tuple[Any, Any]], ttl: Optional[float] = None, default: Any = None) -> Any:
+        """Atomically replace the value with fn(value)[0] and return fn(value)[1]; a new value of None leaves it unchanged"""
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        ...
+
+    def incr(self, namespace: str, key: str, amount: float = 1, ttl: Optional[float] = None) -> float:
+        def add(value):
+            value = (value or 0) + amount
+            return value, value
+        return self.update(namespace, key, add, ttl)
+
+    def compare_and_set(self, namespace: str, key: str, expected: Any, value: Any, ttl: Optional[float] = None) -> bool:
+        def swap(current):
+            if current != expected:
+                return None, False
+            return value, True
+        return self.update(namespace, key, swap, ttl, default=False)
+
+    def close(self):
+        pass
+
+
+class MemorySharedState(SharedState):
+    """Process-local backend; shared by everything in one process, including threads"""
+
+    def __init__(self):
+        # namespace -> key -> (value, expires_at or None)
+        self.data = {}
+        self.lock = threading.RLock()
+
+    def _live(self, namespace: str, key: str):
+        entry = self.data.get(namespace, {}).get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.time():
+            del self.data[namespace][key]
+            return None
+        return entry
+
+    def get(self, namespace: str, key: str) -> Any:
+        with self.lock:
+            entry = self._live(namespace, key)
+            return entry[0] if entry else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self.lock:
+            self.data.setdefault(namespace, {})[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self.lock:
+            return self.data.get(namespace, {}).pop(key, None) is not None
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Tuple[Any, Any]], ttl: Optional[float] = None, default: Any = None) -> Any:
+        with self.lock:
+            entry = self._live(namespace, key)
+            value, result = fn(entry[0] if entry else None)
+            if value is not None:
+                self.set(namespace, key, value, ttl)
+            return result
+
+    def keys(self, namespace: str) -> List[str]:
+        with self.lock:
+            return [key for key in list(self.data.get(namespace, {})) if self._live(namespace, key)]
+
+    def clear(self, namespace: str):
+        with self.lock:
+            self.data.pop(namespace, None)
+
+
+class SQLiteSharedState(SharedState):
+    """SQLite/WAL backend that is safe for several processes on one host.
+
+    update() runs inside BEGIN IMMEDIATE, which holds SQLite's write lock for
+    the read-modify-write, so concurrent processes serialise on it. Calls are
+    synchronous: while another process holds the lock the caller (and so the
+    event loop) blocks for up to busy_timeout, after which update() gives up
+    and returns its default. Each transaction is a single-row read and write,
+    so waits are normally far shorter than that.
+    """
+
+    durable = True
+
+    def __init__(self, db_file: str = 'shared_state.db', busy_timeout: float = 0.5, sweep_interval: float = 300.0):
+        self.db_file = db_file
+        self.sweep_interval = sweep_interval
+        self.last_sweep = time.time()
+        # One connection per process, guarded for use from worker threads too
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(db_file, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS state (namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                        'expires REAL, PRIMARY KEY (namespace, key)) WITHOUT ROWID')
+
+    def _read(self, namespace: str, key: str) -> Any:
+        row = self.db.execute('SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires IS NULL OR expires > ?)',
+                              (namespace, key, time.time())).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, namespace: str, key: str, value: Any, ttl: Optional[float]):
+        self.db.execute('INSERT OR REPLACE INTO state (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                        (namespace, key, json.dumps(value, separators=(',', ':'), default=str), time.time() + ttl if ttl else None))
+
+    def get(self, namespace: str, key: str) -> Any:
+        with self.lock:
+            try:
+                return self._read(namespace, key)
+            except Exception as e:
+                print(f"Error reading shared state: {e}")
+                return None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self.lock:
+            try:
+                self._write(namespace, key, value, ttl)
+            except Exception as e:
+                print(f"Error writing shared state: {e}")
+            self._maybe_sweep()
+
+    def delete(self, namespace: str, key: str) -> bool:
+        with self.lock:
+            try:
+                return self.db.execute('DELETE FROM state WHERE namespace = ? AND key = ?', (namespace, key)).rowcount > 0
+            except Exception as e:
+                print(f"Error deleting shared state: {e}")
+                return False
+
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Tuple[Any, Any]], ttl: Optional[float] = None, default: Any = None) -> Any:
+        with self.lock:
+            try:
+                self.db.execute('BEGIN IMMEDIATE')
+            except sqlite3.Error as e:
+                # Typically "database is locked" after busy_timeout
+                print(f"Error updating shared state: {e}")
+                return default
+            try:
+                value, result = fn(self._read(namespace, key))
+                if value is not None:
+                    self._write(namespace, key, value, ttl)
+                self.db.execute('COMMIT')
+            except sqlite3.Error as e:
+                self.db.execute('ROLLBACK')
+                print(f"Error updating shared state: {e}")
+                return default
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+            self._maybe_sweep()
+            return result
+
+    def keys(self, namespace: str) -> List[str]:
+        with self.lock:
+            rows = self.db.execute('SELECT key FROM state WHERE namespace = ? AND (expires IS NULL OR expires > ?)',
+                                   (namespace, time.time()))
+            return [row[0] for row in rows]
+
+    def clear(self, namespace: str):
+        with self.lock:
+            try:
+                self.db.execute('DELETE FROM state WHERE namespace = ?', (namespace,))
+            except Exception as e:
+                print(f"Error clearing shared state: {e}")
+
+    def _maybe_sweep(self):
+        if time.time() - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = time.time()
+        try:
+            self.db.execute('DELETE FROM state WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        except Exception as e:
+            print(f"Error sweeping shared state: {e}")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result.
+
+    Only failures marked 'definitive' (every provider actually answered) are
+    negative-cached, since those don't depend on one caller's options.
+    """
+
+    def __init__(self, negative_ttl: float = 10.0):
+        self.negative_ttl = negative_ttl
+        self.in_flight = {}
+        # key -> (failed result, timestamp)
+        self.failures = {}
+        self.coalesced = 0
+        self.negative_hits = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Dict]]) -> Dict:
+        failure = self._recent_failure(key)
+        if failure is not None:
+            self.negative_hits += 1
+            return failure
+
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield() so one impatient caller cancelling doesn't cancel everyone else
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(self._run(key, func))
+        self.in_flight[key] = future
+        return await asyncio.shield(future)
+
+    async def _run(self, key: str, func: Callable[[], Awaitable[Dict]]) -> Dict:
+        try:
+            result = await func()
+        except Exception as e:
+            result = {
+                'success': False,
+                'error': f'Bypass failed: {str(e)}',
+                'api_name': 'All providers failed'
+            }
+        finally:
+            self.in_flight.pop(key, None)
+
+        if not result.get('success') and result.get('definitive'):
+            if len(self.failures) >= 1000:
+                self._prune()
+            self.failures[key] = (result, time.monotonic())
+        return result
+
+    def _prune(self):
+        now = time.monotonic()
+        for key in [key for key, (_, timestamp) in self.failures.items() if now - timestamp >= self.negative_ttl]:
+            del self.failures[key]
+
+    def _recent_failure(self, key: str) -> Optional[Dict]:
+        entry = self.failures.get(key)
+        if entry is None:
+            return None
+        result, timestamp = entry
+        if time.monotonic() - timestamp < self.negative_ttl:
+            return result
+        del self.failures[key]
+        return None
+
+    def get_stats(self) -> Dict:
+        return {
+            'in_flight': len(self.in_flight),
+            'coalesced': self.coalesced,
+            'negative_hits': self.negative_hits,
+            'negative_entries': len(self.failures)
+        }
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from bypass_provider import BypassProvider
+
+
+class StubProvider:
+    """ZEN-style endpoint whose reply is switched between 'error', 'timeout' and 'ok'"""
+
+    def __init__(self):
+        self.mode = 'error'
+        self.delay = 0.0
+        self.hits = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request):
+        self.hits += 1
+        if self.mode == 'timeout':
+            await asyncio.sleep(1)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.mode == 'error':
+            return web.Response(status=502, text='Bad Gateway')
+        url = request.query['url']
+        return web.json_response({'status': 'success', 'result': [f'loadstring("{url}")', url]})
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get('/v1/bypass', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.url = f'http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}'
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def make_provider(stub, tmp_path, threshold=3, reset_timeout=0.3):
+    return BypassProvider(
+        zen_api_key='test',
+        stats_file=str(tmp_path / 'provider_stats.json'),
+        routing_file=str(tmp_path / 'routing_index.json'),
+        breaker_threshold=threshold,
+        breaker_reset_timeout=reset_timeout,
+        base_urls={'zen-bypass': stub.url}
+    )
+
+
+async def fail_until_open(provider, count, timeout=5, start=0):
+    # Distinct links, so neither coalescing nor the negative cache hide a call
+    for i in range(start, start + count):
+        result = await provider.bypass(f'https://example.com/fail/{i}', timeout=timeout)
+        assert not result['success']
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_opens_after_threshold_errors(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            async with make_provider(stub, tmp_path) as provider:
+                await fail_until_open(provider, 2)
+                assert provider.breakers['zen-bypass'].get_state()['state'] == 'closed'
+                await fail_until_open(provider, 1, start=2)
+                assert provider.breakers['zen-bypass'].get_state()['state'] == 'open'
+                assert stub.hits == 3
+    run(scenario())
+
+
+def test_opens_after_threshold_timeouts(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            stub.mode = 'timeout'
+            async with make_provider(stub, tmp_path) as provider:
+                await fail_until_open(provider, 3, timeout=0.1)
+                assert provider.breakers['zen-bypass'].get_state()['state'] == 'open'
+    run(scenario())
+
+
+def test_open_circuit_skips_instantly(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            async with make_provider(stub, tmp_path, reset_timeout=30) as provider:
+                await fail_until_open(provider, 3)
+                hits = stub.hits
+                started = time.perf_counter()
+                result = await provider.bypass('https://example.com/skipped')
+                assert time.perf_counter() - started < 0.05
+                assert not result['success']
+                assert 'temporarily disabled' in result['error']
+                assert stub.hits == hits
+    run(scenario())
+
+
+def test_half_open_lets_exactly_one_probe_through(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            async with make_provider(stub, tmp_path) as provider:
+                await fail_until_open(provider, 3)
+                await asyncio.sleep(0.35)
+                stub.mode, stub.delay = 'ok', 0.2
+                hits = stub.hits
+                results = await asyncio.gather(*(provider.bypass(f'https://example.com/probe/{i}') for i in range(5)))
+                assert stub.hits - hits == 1
+                assert sum(result['success'] for result in results) == 1
+    run(scenario())
+
+
+def test_successful_probe_closes_circuit(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            async with make_provider(stub, tmp_path) as provider:
+                await fail_until_open(provider, 3)
+                await asyncio.sleep(0.35)
+                stub.mode = 'ok'
+                assert (await provider.bypass('https://example.com/probe'))['success']
+                assert provider.breakers['zen-bypass'].get_state()['state'] == 'closed'
+                assert (await provider.bypass('https://example.com/after'))['success']
+    run(scenario())
+
+
+def test_failed_probe_reopens_circuit(tmp_path):
+    async def scenario():
+        async with StubProvider() as stub:
+            async with make_provider(stub, tmp_path) as provider:
+                await fail_until_open(provider, 3)
+                await asyncio.sleep(0.35)
+                assert not (await provider.bypass('https://example.com/probe'))['success']
+                assert provider.breakers['zen-bypass'].get_state()['state'] == 'open'
+                assert provider.breakers['zen-bypass'].times_opened == 2
+    run(scenario())
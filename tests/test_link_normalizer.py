@@ -0,0 +1,34 @@
+import json
+import os
+
+import pytest
+
+from link_normalizer import INVALID_LINK, UNSUPPORTED_LINK, cache_key, check_link
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'link_variants.json'), 'r') as f:
+    CORPUS = json.load(f)
+
+VARIANTS = [(variant, group['canonical']) for group in CORPUS['groups'] for variant in group['variants']]
+REJECTED = [(link, INVALID_LINK) for link in CORPUS['invalid']] + [(link, UNSUPPORTED_LINK) for link in CORPUS['unsupported']]
+
+
+@pytest.mark.parametrize('link, canonical', VARIANTS)
+def test_variant_canonicalises_to_group(link, canonical):
+    assert check_link(link) == (canonical, None)
+    assert cache_key(link) == cache_key(canonical)
+
+
+@pytest.mark.parametrize('link, error', REJECTED)
+def test_rejected_before_any_request(link, error):
+    assert check_link(link) == (None, error)
+
+
+def test_groups_have_distinct_keys():
+    keys = [cache_key(group['canonical']) for group in CORPUS['groups']]
+    assert len(set(keys)) == len(keys)
+
+
+def test_cache_key_is_stable():
+    # Keys are persisted in the SQLite cache tier, so they must not change between runs
+    assert cache_key('https://linkvertise.com/123456/example-script') == cache_key('linkvertise.com/123456/example-script/')
+    assert len(cache_key('https://linkvertise.com/123456/example-script')) == 24
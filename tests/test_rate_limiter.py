@@ -0,0 +1,23 @@
+import pytest
+
+from rate_limiter import RateLimiter
+
+
+def allowed_times(limiter, arrivals):
+    return [now for now in arrivals if limiter.engine.consume('user', now=now)['allowed']]
+
+
+@pytest.mark.parametrize('max_requests', [1, 2, 3, 10, 25])
+@pytest.mark.parametrize('burst', [None, 1, 'max'])
+def test_never_more_than_max_requests_in_any_window(max_requests, burst):
+    limiter = RateLimiter(max_requests, 60, burst=max_requests if burst == 'max' else burst)
+    # One attempt every 0.25s for ten minutes
+    allowed = allowed_times(limiter, [i * 0.25 for i in range(2400)])
+    assert max(sum(1 for t in allowed if start <= t < start + 60) for start in allowed) <= max_requests
+
+
+def test_burst_then_refill():
+    limiter = RateLimiter(10, 60)
+    assert len(allowed_times(limiter, [0.0] * 20)) == 5
+    # The other five come back one every 10s
+    assert allowed_times(limiter, [9.9, 10.0, 20.0]) == [10.0, 20.0]
@@ -1,67 +1,54 @@
-import json
-import os
-from datetime import datetime
+from typing import Iterable, Optional
+from blacklist_store import BlacklistStore
+from shared_state import SharedState
 
 class UserActivity:
-    def __init__(self, activity_file='user_activity.json'):
+    def __init__(self, activity_file='user_activity.json', shared: Optional[SharedState] = None):
         self.activity_file = activity_file
-        self.data = self.load_data()
+        self.store = BlacklistStore(activity_file, ['blacklisted_users', 'blacklisted_hwids'], shared=shared)
     
     def load_data(self):
-        try:
-            if os.path.exists(self.activity_file):
-                with open(self.activity_file, 'r') as f:
-                    return json.load(f)
-        except Exception as e:
-            print(f"Error loading user activity: {e}")
-        return {
-            'blacklisted_users': [],
-            'blacklisted_hwids': []
-        }
+        self.store.load_data()
     
     def save_data(self):
-        try:
-            with open(self.activity_file, 'w') as f:
-                json.dump(self.data, f, indent=2)
-        except Exception as e:
-            print(f"Error saving user activity: {e}")
+        self.store.compact()
+    
+    def is_user_blacklisted(self, user_id: int) -> bool:
+        return self.store.contains('blacklisted_users', user_id)
+    
+    def is_hwid_blacklisted(self, hwid: str) -> bool:
+        return self.store.contains('blacklisted_hwids', hwid)
     
     def blacklist_user(self, user_id: int) -> bool:
-        if user_id not in self.data.get('blacklisted_users', []):
-            if 'blacklisted_users' not in self.data:
-                self.data['blacklisted_users'] = []
-            self.data['blacklisted_users'].append(user_id)
-            self.save_data()
-            return True
-        return False
+        return self.store.add('blacklisted_users', user_id)
     
     def unblacklist_user(self, user_id: int) -> bool:
-        if user_id in self.data.get('blacklisted_users', []):
-            self.data['blacklisted_users'].remove(user_id)
-            self.save_data()
-            return True
-        return False
+        return self.store.remove('blacklisted_users', user_id)
     
     def blacklist_hwid(self, hwid: str) -> bool:
-        if hwid not in self.data.get('blacklisted_hwids', []):
-            if 'blacklisted_hwids' not in self.data:
-                self.data['blacklisted_hwids'] = []
-            self.data['blacklisted_hwids'].append(hwid)
-            self.save_data()
-            return True
-        return False
+        return self.store.add('blacklisted_hwids', hwid)
     
     def unblacklist_hwid(self, hwid: str) -> bool:
-        if hwid in self.data.get('blacklisted_hwids', []):
-            self.data['blacklisted_hwids'].remove(hwid)
-            self.save_data()
-            return True
-        return False
+        return self.store.remove('blacklisted_hwids', hwid)
+    
+    def import_blacklist(self, user_ids: Iterable[int] = (), hwids: Iterable[str] = ()) -> dict:
+        return {
+            'users_added': self.store.bulk_add('blacklisted_users', user_ids),
+            'hwids_added': self.store.bulk_add('blacklisted_hwids', hwids)
+        }
+    
+    def export_blacklist(self) -> dict:
+        return {
+            'blacklisted_users': self.store.export('blacklisted_users'),
+            'blacklisted_hwids': self.store.export('blacklisted_hwids')
+        }
     
     def get_blacklist_data(self):
+        user_ids = self.store.export('blacklisted_users')
+        hwids = self.store.export('blacklisted_hwids')
         return {
-            'total_users': len(self.data.get('blacklisted_users', [])),
-            'total_hwids': len(self.data.get('blacklisted_hwids', [])),
-            'user_ids': self.data.get('blacklisted_users', []),
-            'hwids': self.data.get('blacklisted_hwids', [])
+            'total_users': len(user_ids),
+            'total_hwids': len(hwids),
+            'user_ids': user_ids,
+            'hwids': hwids
         }
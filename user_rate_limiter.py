@@ -1,124 +1,170 @@
-import json
+import asyncio
 import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timezone
 from typing import Dict, List, Optional
+from rate_store import RateStore, SQLiteRateStore
+from rate_limit_engine import RateLimitEngine, Rule
+from shared_state import SharedState
+
+def _to_epoch(value) -> float:
+    # Older records stored naive UTC ISO-8601 strings
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+    return float(value)
 
 class UserRateLimiter:
-    def __init__(self, rate_file='user_rates.json'):
+    def __init__(self, rate_file='user_rates.json', store: Optional[RateStore] = None, write_behind: bool = True, flush_interval: float = 5.0,
+                 short_term_limit: int = 1, short_term_window: float = 15, daily_limit: int = 5,
+                 shared: Optional[SharedState] = None, namespace: str = 'user_rates'):
         self.rate_file = rate_file
-        self.user_data = self.load_data()
-        self.short_term_limit = 1
-        self.short_term_window = 15
-        self.daily_limit = 5
+        # Defaults to SQLite next to the old JSON file, importing it on first run
+        self.store = store or SQLiteRateStore(f"{os.path.splitext(rate_file)[0]}.db", migrate_from=rate_file)
+        # With a shared backend every process reads and updates the same limits; the store is only imported once,
+        # and is still written to when the backend does not outlive the process (MemorySharedState)
+        self.shared = shared
+        self.persist = shared is None or not shared.durable
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.dirty = set()
+        self.last_flush = time.monotonic()
+        self.short_term_limit = short_term_limit
+        self.short_term_window = short_term_window
+        self.daily_limit = daily_limit
+        self.engine = RateLimitEngine([
+            Rule('short_term', short_term_limit, short_term_window),
+            Rule('daily', daily_limit, 86400, fixed_window=True)
+        ], shared=shared, namespace=namespace)
+        if shared is None:
+            self.engine.state = self.load_data()
+        else:
+            self._import_into_shared()
     
-    def load_data(self) -> Dict:
-        try:
-            if os.path.exists(self.rate_file):
-                with open(self.rate_file, 'r') as f:
-                    data = json.load(f)
-                    return {int(k): v for k, v in data.items()}
-        except Exception as e:
-            print(f"Error loading rate limit data: {e}")
-        return {}
+    def _import_into_shared(self):
+        namespace = self.engine.namespace
+        if self.shared.keys(namespace):
+            return
+        now = time.time()
+        for user_id, tats in self.load_data().items():
+            if any(tat > rule.base(now) for tat, rule in zip(tats, self.engine.rules)):
+                self.shared.compare_and_set(namespace, str(user_id), None, tats, self.engine.shared_ttl)
+    
+    @property
+    def user_data(self) -> Dict[int, List[float]]:
+        return self.engine.state
+    
+    def load_data(self) -> Dict[int, List[float]]:
+        user_data = {}
+        for user_id, data in self.store.load_all().items():
+            try:
+                user_data[user_id] = self._from_record(data)
+            except Exception as e:
+                print(f"Error loading rate limit data for {user_id}: {e}")
+        return user_data
+    
+    def _from_record(self, data: Dict) -> List[float]:
+        if 'tats' in data:
+            return [float(tat) for tat in data['tats']]
+        
+        # Legacy record: replay the recent timestamps and daily count into TATs
+        short_term, daily = self.engine.rules
+        short_tat = 0.0
+        for ts in data.get('short_term', []):
+            short_tat = max(short_tat, _to_epoch(ts)) + short_term.interval
+        daily_tat = 0.0
+        if data.get('daily_reset') and data.get('daily_count'):
+            daily_tat = _to_epoch(data['daily_reset']) - daily.period + data['daily_count'] * daily.interval
+        return [short_tat, daily_tat]
     
     def save_data(self):
+        if self.dirty:
+            dirty, self.dirty = self.dirty, set()
+            if self.store.full_rewrite:
+                records = {user_id: {'tats': tats} for user_id, tats in self._all_state().items()}
+            else:
+                # Users evicted as idle are saved as empty state, which reads back as fresh
+                records = {user_id: {'tats': self.engine.get_state(user_id) or []} for user_id in dirty}
+            self.store.save(records, dirty)
+        self.last_flush = time.monotonic()
+    
+    def _all_state(self) -> Dict[int, List[float]]:
+        if self.shared is None:
+            return self.user_data
+        namespace = self.engine.namespace
+        state = {}
+        for key in self.shared.keys(namespace):
+            tats = self.shared.get(namespace, key)
+            if tats is not None:
+                state[int(key)] = tats
+        return state
+    
+    def flush(self):
+        self.save_data()
+    
+    def close(self):
+        self.save_data()
+        self.store.close()
+    
+    async def run_flusher(self):
+        # Background task for write-behind mode; flushes once more when cancelled
         try:
-            with open(self.rate_file, 'w') as f:
-                json.dump({str(k): v for k, v in self.user_data.items()}, f, indent=2)
-        except Exception as e:
-            print(f"Error saving rate limit data: {e}")
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                self.save_data()
+        finally:
+            self.save_data()
     
     def clean_old_timestamps(self, user_id: int):
-        if user_id not in self.user_data:
-            return
-        
-        current_time = datetime.utcnow()
-        
-        if 'short_term' in self.user_data[user_id]:
-            self.user_data[user_id]['short_term'] = [
-                ts for ts in self.user_data[user_id]['short_term']
-                if (current_time - datetime.fromisoformat(ts)).total_seconds() < self.short_term_window
-            ]
-        
-        if 'daily_reset' in self.user_data[user_id]:
-            reset_time = datetime.fromisoformat(self.user_data[user_id]['daily_reset'])
-            if current_time >= reset_time:
-                self.user_data[user_id]['daily_count'] = 0
-                next_reset = current_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-                self.user_data[user_id]['daily_reset'] = next_reset.isoformat()
+        # Kept for API compatibility; GCRA state never needs cleaning
+        pass
     
-    def check_rate_limit(self, user_id: int) -> Dict:
-        current_time = datetime.utcnow()
-        
-        if user_id not in self.user_data:
-            next_reset = current_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            self.user_data[user_id] = {
-                'short_term': [],
-                'daily_count': 0,
-                'daily_reset': next_reset.isoformat()
-            }
-        
-        self.clean_old_timestamps(user_id)
-        
-        short_term_count = len(self.user_data[user_id].get('short_term', []))
-        if short_term_count >= self.short_term_limit:
-            oldest_timestamp = datetime.fromisoformat(self.user_data[user_id]['short_term'][0])
-            retry_after = self.short_term_window - (current_time - oldest_timestamp).total_seconds()
-            return {
-                'allowed': False,
-                'limit_type': 'short_term',
-                'retry_after': max(0, retry_after)
-            }
-        
-        daily_count = self.user_data[user_id].get('daily_count', 0)
-        if daily_count >= self.daily_limit:
-            reset_time = datetime.fromisoformat(self.user_data[user_id]['daily_reset'])
-            retry_after = (reset_time - current_time).total_seconds()
-            return {
-                'allowed': False,
-                'limit_type': 'daily',
-                'retry_after': max(0, retry_after)
-            }
-        
+    def _to_legacy(self, result: Dict) -> Dict:
+        if not result['allowed']:
+            return result
         return {
             'allowed': True,
-            'remaining_short_term': self.short_term_limit - short_term_count,
-            'remaining_daily': self.daily_limit - daily_count
+            'remaining_short_term': result['remaining']['short_term'],
+            'remaining_daily': result['remaining']['daily']
         }
     
+    def check_rate_limit(self, user_id: int) -> Dict:
+        return self._to_legacy(self.engine.check(user_id))
+    
+    def acquire(self, user_id: int) -> Dict:
+        """Atomically check both limits and record a bypass if allowed"""
+        result = self.engine.consume(user_id)
+        if result['allowed']:
+            self._mark_dirty(user_id)
+        return self._to_legacy(result)
+    
+    def refund(self, user_id: int):
+        """Give back a bypass taken with acquire(), e.g. when every provider failed"""
+        self.engine.refund(user_id)
+        self._mark_dirty(user_id)
+    
     def record_bypass(self, user_id: int):
-        current_time = datetime.utcnow()
-        
-        if user_id not in self.user_data:
-            next_reset = current_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            self.user_data[user_id] = {
-                'short_term': [],
-                'daily_count': 0,
-                'daily_reset': next_reset.isoformat()
-            }
-        
-        if 'short_term' not in self.user_data[user_id]:
-            self.user_data[user_id]['short_term'] = []
-        
-        self.user_data[user_id]['short_term'].append(current_time.isoformat())
-        self.user_data[user_id]['daily_count'] = self.user_data[user_id].get('daily_count', 0) + 1
-        
-        self.save_data()
+        self.engine.consume(user_id, force=True)
+        self._mark_dirty(user_id)
+    
+    def _mark_dirty(self, user_id: int):
+        if not self.persist:
+            return
+        self.dirty.add(user_id)
+        if not self.write_behind or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.save_data()
     
     def get_user_stats(self, user_id: int) -> Dict:
-        if user_id not in self.user_data:
+        if self.engine.get_state(user_id) is None:
             return {
                 'daily_count': 0,
                 'daily_limit': self.daily_limit,
                 'remaining': self.daily_limit
             }
         
-        self.clean_old_timestamps(user_id)
-        
-        daily_count = self.user_data[user_id].get('daily_count', 0)
+        remaining = self.engine.remaining(user_id, 1)
         return {
-            'daily_count': daily_count,
+            'daily_count': self.daily_limit - remaining,
             'daily_limit': self.daily_limit,
-            'remaining': max(0, self.daily_limit - daily_count),
-            'reset_time': self.user_data[user_id].get('daily_reset')
+            'remaining': remaining,
+            'reset_time': datetime.utcfromtimestamp(self.engine.window_reset(1)).isoformat()
         }